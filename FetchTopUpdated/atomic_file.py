@@ -0,0 +1,84 @@
+import os
+import shutil
+import threading
+
+# Linux can create the file with no name at all and link it in once it is complete;
+# switched off for the rest of the run the first time a filesystem refuses the link
+USE_O_TMPFILE = hasattr(os, "O_TMPFILE") and os.path.isdir("/proc/self/fd")
+
+
+class AtomicFile:
+    """Write a file that only appears at path once it is complete.
+
+        with AtomicFile(path) as f:
+            f.write(...)
+
+    The data goes to an anonymous O_TMPFILE in the target directory (or a
+    hidden ".<name>.part" file where that isn't available), is fsynced, and
+    then replaces path in one rename. If the block raises, nothing is left
+    behind and an existing file at path is untouched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.folder = os.path.dirname(path) or "."
+        self.file = None
+        self._part = None
+
+    def _part_path(self):
+        name = os.path.basename(self.path)
+        return os.path.join(self.folder, f".{name}.{os.getpid()}.{threading.get_ident()}.part")
+
+    def __enter__(self):
+        if USE_O_TMPFILE:
+            try:
+                # Readable too, so the data can still be copied out if linking it fails
+                self.file = os.fdopen(os.open(self.folder, os.O_TMPFILE | os.O_RDWR, 0o644), "w+b")
+                return self.file
+            except OSError:  # filesystem without O_TMPFILE support
+                pass
+        self._part = self._part_path()
+        self.file = os.fdopen(os.open(self._part, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644), "wb")
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self._publish()
+        finally:
+            self.file.close()
+            if self._part:
+                try:
+                    os.remove(self._part)
+                except FileNotFoundError:
+                    pass
+        return False
+
+    def _publish(self):
+        if self._part is None:
+            # Name the finished anonymous file, then move it over the target
+            self._part = self._part_path()
+            try:
+                os.link(f"/proc/self/fd/{self.file.fileno()}", self._part)
+            except OSError:  # e.g. EXDEV where /proc links can't be followed
+                self._copy_to_part()
+        os.replace(self._part, self.path)
+        self._part = None
+        if hasattr(os, "O_DIRECTORY"):
+            # Make the rename itself durable
+            dir_fd = os.open(self.folder, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _copy_to_part(self):
+        global USE_O_TMPFILE
+        USE_O_TMPFILE = False
+        self.file.seek(0)
+        with open(self._part, "wb") as out:
+            shutil.copyfileobj(self.file, out)
+            out.flush()
+            os.fsync(out.fileno())
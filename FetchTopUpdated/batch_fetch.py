@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+from ytmusic_utils import get_ytmusic
+from yt_trending import fetch_song_data, TRACK_LIMIT, METADATA_WORKERS
+from metadata_cache import print_stats
+from manifest import get_manifest
+from snapshot import load_snapshot, save_snapshot, diff_snapshot, reusable_tracks, print_diff
+from tracks_io import TracksWriter
+
+# Top songs and new releases by default; both charts share many hits
+PLAYLIST_IDS = [p for p in os.getenv("PLAYLIST_IDS", "PL4fGSI1pDJn40WjZ6utkIuj2rNg-7iGsq,RDATdX").split(",") if p]
+PLAYLIST_WORKERS = int(os.getenv("PLAYLIST_WORKERS", "4"))
+TRACKS_FILE = os.path.join("data", "tracks.jsonl")
+
+
+def fetch_chart(playlist_id, limit):
+    playlist = get_ytmusic().get_playlist(playlist_id, limit=100)
+    return [t["videoId"] for t in playlist["tracks"][:limit] if t.get("videoId")]
+
+
+def fetch_charts(playlist_ids, limit=TRACK_LIMIT, workers=PLAYLIST_WORKERS):
+    """Fetch every playlist at once: playlist_id -> [videoId, ...]. Failed playlists are left out."""
+    charts = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pid: pool.submit(fetch_chart, pid, limit) for pid in playlist_ids}
+        for pid, future in futures.items():
+            try:
+                charts[pid] = future.result()
+            except Exception as e:
+                print(f"[ERROR] Failed to fetch playlist {pid}: {e}", file=sys.stderr)
+    return charts
+
+
+def merge_charts(charts):
+    """Collapse charts into unique videoIds in first-seen order.
+
+    Returns (videoIds, membership) where membership maps each videoId to the
+    ((playlistId, position), ...) pairs it charted at.
+    """
+    membership = {}
+    for pid, chart in charts.items():
+        for position, videoId in enumerate(chart, start=1):
+            membership.setdefault(videoId, []).append((pid, position))
+    videoIds = list(membership)
+    print(f"[INFO] {sum(len(c) for c in charts.values())} chart entries across {len(charts)} "
+          f"playlists -> {len(videoIds)} unique tracks", file=sys.stderr)
+    return videoIds, {v: tuple(m) for v, m in membership.items()}
+
+
+def reusable_from_snapshots(charts):
+    """Carried-over Tracks from every playlist's previous snapshot, plus their fetch times."""
+    reused, fetched_at = {}, {}
+    for pid, chart in charts.items():
+        previous = load_snapshot(pid)
+        tracks, times = reusable_tracks(previous, chart)
+        print_diff(diff_snapshot(previous, chart), len(tracks), file=sys.stderr, label=pid)
+        reused.update(tracks)
+        fetched_at.update(times)
+    return reused, fetched_at
+
+
+def save_snapshots(charts, tracks, fetched_at):
+    for pid, chart in charts.items():
+        save_snapshot(pid, chart, tracks, fetched_at)
+
+
+def fetch_batch_metadata(playlist_ids=PLAYLIST_IDS, limit=TRACK_LIMIT, workers=METADATA_WORKERS,
+                         filename=TRACKS_FILE, on_track=None):
+    """Fetch metadata once per unique videoId across all playlists into one tracks file.
+
+    Returns videoId -> Track in chart order; on_track is called with each Track as it is written.
+    """
+    charts = fetch_charts(playlist_ids, limit)
+    if not charts:
+        return {}
+    videoIds, membership = merge_charts(charts)
+    reused, fetched_at = reusable_from_snapshots(charts)
+
+    def get_track(videoId):
+        track = reused.get(videoId)
+        if track:
+            get_manifest().mark_fetched(videoId)
+        else:
+            track = fetch_song_data(videoId)
+            if not track:
+                return None
+            fetched_at[videoId] = time.time()
+        return replace(track, playlists=membership[videoId])
+
+    tracks = {}
+    with TracksWriter(filename) as writer, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for idx, track in enumerate(pool.map(get_track, videoIds), start=1):
+            if not track:
+                continue
+            tracks[track.videoId] = track
+            writer.write(track.to_dict())
+            if on_track:
+                on_track(track)
+            charted = ", ".join(f"{pid}#{pos}" for pid, pos in track.playlists)
+            print(f"[{idx}] {track.title} - {track.urlCanonical} ({charted})", file=sys.stderr)
+
+    save_snapshots(charts, tracks, fetched_at)
+    print(f"[INFO] Saved {len(tracks)} unique tracks to {filename}", file=sys.stderr)
+    print_stats(file=sys.stderr)
+    return tracks
+
+
+if __name__ == "__main__":
+    fetch_batch_metadata()
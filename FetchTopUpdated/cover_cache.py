@@ -0,0 +1,197 @@
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+
+COVER_DIR = os.getenv("COVER_CACHE_DIR", os.path.join(".cache", "covers"))
+# Evict least recently used images once the stored covers pass this size
+COVER_CACHE_BYTES = int(os.getenv("COVER_CACHE_BYTES", str(200 * 1024 * 1024)))
+# Longest side of the embedded image, and its JPEG quality when Pillow is installed
+COVER_SIZE = int(os.getenv("COVER_SIZE", "544"))
+COVER_QUALITY = int(os.getenv("COVER_QUALITY", "90"))
+EMBED_COVER = os.getenv("EMBED_COVER", "1") == "1"
+# Downloads of the same URL wait on one lock; distinct URLs rarely share one of these
+URL_LOCK_STRIPES = 64
+
+
+def cover_request_url(url, size=COVER_SIZE):
+    """Ask googleusercontent for the size we embed instead of the tiny default thumbnail."""
+    if "googleusercontent.com" in url:
+        return re.sub(r"=[^/=]*$", "", url) + f"=w{size}-h{size}-l90-rj"
+    return url
+
+
+def sniff_mime(data):
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def normalize_image(data):
+    """Resize and re-encode once, so every file embeds the same small JPEG.
+
+    Returns None when the image isn't a JPEG and Pillow isn't installed to
+    convert it; players handle webp covers badly, so those are left out.
+    """
+    try:
+        from PIL import Image
+    except ImportError:  # without Pillow only JPEGs are embedded, exactly as downloaded
+        return (data, "image/jpeg") if sniff_mime(data) == "image/jpeg" else None
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGB")
+        img.thumbnail((COVER_SIZE, COVER_SIZE))
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=COVER_QUALITY, optimize=True)
+    return out.getvalue(), "image/jpeg"
+
+
+class CoverCache:
+    """Cover art on disk, keyed by URL and stored once per content hash.
+
+    Different URLs that serve the same picture (one album, many tracks) share
+    one file. Concurrent requests for the same URL wait for a single download.
+    """
+
+    def __init__(self, folder=COVER_DIR, max_bytes=COVER_CACHE_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(folder, "blobs"), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        import requests  # deferred so scripts that never fetch a cover don't pay for it
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._url_locks = [threading.Lock() for _ in range(URL_LOCK_STRIPES)]
+        self._conn = sqlite3.connect(os.path.join(folder, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, hash TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " hash TEXT PRIMARY KEY, mime TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.folder, "blobs", digest)
+
+    def _lookup(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT b.hash, b.mime FROM urls u JOIN blobs b ON b.hash = u.hash WHERE u.url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE blobs SET last_used = ? WHERE hash = ?", (time.time(), row[0]))
+            self._conn.commit()
+        try:
+            with open(self._blob_path(row[0]), "rb") as f:
+                return f.read(), row[1]
+        except FileNotFoundError:
+            return None
+
+    def _store(self, url, data, mime):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO blobs (hash, mime, size, last_used) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(hash) DO UPDATE SET last_used = excluded.last_used",
+                (digest, mime, len(data), now),
+            )
+            self._conn.execute("INSERT OR REPLACE INTO urls (url, hash, fetched_at) VALUES (?, ?, ?)",
+                               (url, digest, now))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        if total <= self.max_bytes:
+            return
+        for digest, size in self._conn.execute("SELECT hash, size FROM blobs ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM urls WHERE hash = ?", (digest,))
+            self._conn.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+
+    def get(self, url):
+        """Return (image bytes, mime type) for url, downloading it on a miss.
+
+        Returns None if the image can't be embedded (see normalize_image).
+        """
+        url_lock = self._url_locks[hash(url) % URL_LOCK_STRIPES]
+        with url_lock:
+            cached = self._lookup(url)
+            if cached:
+                with self._lock:
+                    self.hits += 1
+                return cached
+            res = self.session.get(cover_request_url(url), timeout=30)
+            res.raise_for_status()
+            image = normalize_image(res.content)
+            with self._lock:
+                self.misses += 1
+            if image is None:
+                print(f"[SKIP] Cover for {url} is {sniff_mime(res.content) or 'not an image'}; "
+                      f"install Pillow to embed it as JPEG")
+                return None
+            self._store(url, *image)
+            return image
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": entries, "bytes": size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cover_cache():
+    """Return the process-wide cover cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CoverCache()
+        return _cache
+
+
+def fetch_cover(url):
+    """Cover (bytes, mime) for url, or None if there is none or it can't be fetched."""
+    if not url or not EMBED_COVER:
+        return None
+    try:
+        return get_cover_cache().get(url)
+    except Exception as e:
+        print(f"[WARN] Cover download failed for {url}: {e}")
+        return None
+
+
+def print_stats(file=None):
+    if _cache is None:
+        return
+    s = _cache.stats()
+    print(f"[INFO] Cover cache: {s['hits']} hits, {s['misses']} misses, {s['evictions']} evicted, "
+          f"{s['entries']} images ({s['bytes'] / 1024:.0f} KiB)", file=file)
@@ -1,20 +1,69 @@
 import os
-import json
-from yt_dlp import YoutubeDL
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import ID3, ID3NoHeaderError, TKEY, COMM
 import sys
-import io
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from ytmusic_utils import get_song_by_id
-
-# Ensure stdout/stderr handles UTF-8
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+from metadata_cache import print_stats
+from manifest import get_manifest, DOWNLOADED, TAGGED, FAILED
+from metrics import get_metrics
+from rate_limiter import get_limiter, print_stats as print_rate_stats
+from cover_cache import fetch_cover, print_stats as print_cover_stats
+from library_index import get_library, track_digest
+from layout import song_path, link_by_name
+from ydl_engine import EnginePool
+from tagging import write_tags, mp3_tag_bytes
+from transcode import transcode, encode_to, STREAM_FORMATS
+from atomic_file import AtomicFile
+from tracks_io import iter_tracks, resolve_tracks_file
+from track import Track
+
+try:
+    import resource
+except ImportError:  # Windows: ffmpeg CPU time is not available
+    resource = None
+
+# Ensure stdout/stderr handles UTF-8 (reconfigure is safe when imported by pipeline.py)
+sys.stdout.reconfigure(encoding="utf-8")
+sys.stderr.reconfigure(encoding="utf-8")
 
 DATA_FOLDER = "data"
 DOWNLOAD_FOLDER = "Download_Songs"
+# Number of tracks downloaded at once (1 = sequential)
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+# Number of ffmpeg encodes at once, independent of the network workers
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", str(os.cpu_count() or 1)))
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
+# Output format: "mp3" re-encodes to 192k MP3; "m4a" and "opus" keep the
+# source audio stream as-is (ffmpeg only remuxes it) and skip the re-encode
+AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "mp3")
+FORMATS = {
+    "mp3": {"format": "bestaudio/best", "preferredcodec": "mp3", "preferredquality": "192"},
+    "m4a": {"format": "bestaudio[ext=m4a]/bestaudio/best", "preferredcodec": "m4a"},
+    "opus": {"format": "bestaudio[acodec=opus]/bestaudio/best", "preferredcodec": "opus"},
+}
+if AUDIO_FORMAT not in FORMATS:
+    raise ValueError(f"Unsupported AUDIO_FORMAT {AUDIO_FORMAT!r}, expected one of {', '.join(FORMATS)}")
+# MP3s are encoded, tagged and published in one write (see publish_tagged); m4a and
+# opus still go through a temp file because their tags can't simply be prepended
+STREAM_WRITE = AUDIO_FORMAT in STREAM_FORMATS
+
+# yt-dlp options shared by every track. yt-dlp only fetches the source audio;
+# ffmpeg runs separately in transcode() so encodes don't tie up network workers
+YDL_OPTS = {
+    "format": FORMATS[AUDIO_FORMAT]["format"],
+    "outtmpl": os.path.join(DOWNLOAD_FOLDER, "%(id)s.raw.%(ext)s"),
+    "cookiefile": "cookies.txt",  # must be Netscape format
+    "quiet": False,
+    "no_warnings": True,
+    # Progress/postprocessor hooks split download and ffmpeg time when METRICS=1
+    **get_metrics().ydl_hooks(),
+}
+# One long-lived YoutubeDL per download worker
+engines = EnginePool(YDL_OPTS)
+
 
 def sanitize_filename(name):
     """Remove invalid filesystem characters."""
@@ -23,16 +72,24 @@ def sanitize_filename(name):
     return "".join(c for c in name if c.isalnum() or c in " ._-").rstrip()
 
 
-def download_mp3(videoId, title, artist, coverUrl, description,
-                  urlCanonical, viewCount, publishDate, category, tags,
-                  output_folder):
+def is_done(videoId):
+    """True if the song is already tagged on disk (found by videoId, whatever the
+    file is called now) or has used up its attempts."""
+    return get_library().has(videoId) or not get_manifest().needs_download(videoId)
+
+
+def download_raw(track):
+    """Network half of a download: fetch the source audio without running ffmpeg.
+
+    Returns (raw file path, source codec, cover), or None when the track has no URL.
+    """
+    videoId, title, artist = track.videoId, track.title, track.artist
+
     # Construct URL
-    url = urlCanonical or (
-        f"https://music.youtube.com/watch?v={videoId}" if videoId else None
-    )
+    url = track.url if (track.urlCanonical or videoId) else None
     if not url:
         print(f"[SKIP] No valid URL for: {title}")
-        return
+        return None
 
     # Extract basic info
     #title = song.get("title") or "Unknown Title"
@@ -43,20 +100,16 @@ def download_mp3(videoId, title, artist, coverUrl, description,
     #coverUrl = song.get("coverUrl", "")
     
     print(f"✅ Starting download: {title} | Artist: {artist} | VideoID: {videoId}")
-
-    # yt-dlp options
-    ydl_opts = {
-        "format": "bestaudio/best",
-        "outtmpl": os.path.join(DOWNLOAD_FOLDER, "%(id)s.%(ext)s"),
-        "postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": "mp3", "preferredquality": "192"}],
-        "cookiefile": "cookies.txt",  # must be Netscape format
-        "quiet": False,
-        "no_warnings": True,
-    }
+    manifest = get_manifest()
+    manifest.begin(videoId)
+    metrics = get_metrics()
+    if metrics.enabled:
+        metrics.add_retries(videoId, (manifest.get(videoId) or {}).get("attempts", 1) - 1)
 
     try:
-        with YoutubeDL(ydl_opts) as ydl:
-            songdata = ydl.extract_info(url, download=True)
+        engine = engines.get()
+        songdata = get_limiter("youtube").call(engine.download, url, YDL_OPTS["outtmpl"],
+                                               on_retry=lambda: metrics.add_retries(videoId, 1))
 
         print("\n========= Extract video info cleanly =========")
         wanted_keys = ["id", "title", "author", "album", "thumbnail", "description",
@@ -70,7 +123,8 @@ def download_mp3(videoId, title, artist, coverUrl, description,
         print("========= Extract video info cleanly =========\n")
 
         # Optional: fetch additional metadata from utils
-        song_data_ytl = get_song_by_id(videoId)
+        with metrics.timer("metadata", videoId):
+            song_data_ytl = get_song_by_id(videoId)
         """
         ytl_keys = ["videoId", "title", "artist", "coverUrl", "description",
                     "urlCanonical", "viewCount", "publishDate", "category", "tags"]
@@ -98,100 +152,260 @@ def download_mp3(videoId, title, artist, coverUrl, description,
                 publishdate = ytl_value
                 print(f"{key}: {publishdate}")
         """
-        # Prepare file paths
-        temp_filepath = os.path.join(DOWNLOAD_FOLDER, f"{videoId}.mp3")
-        safe_title = sanitize_filename(title)
-        safe_artist = sanitize_filename(artist)
-        final_filepath = os.path.join(DOWNLOAD_FOLDER, f"{safe_title} - {safe_artist}.mp3")
-
-        # Rename file
-        if os.path.exists(temp_filepath):
-            os.rename(temp_filepath, final_filepath)
-        else:
-            print(f"[ERROR] Expected file not found: {temp_filepath}")
-            return
-
-        # ID3 tagging
-        try:
-            audio = EasyID3(final_filepath)
-        except ID3NoHeaderError:
-            ID3().save(final_filepath)
-            audio = EasyID3(final_filepath)
-
-        audio["title"] = title
-        audio["artist"] = artist
-        if tags:
-            audio["composer"] = ", ".join(tags) if isinstance(tags, list) else str(tags)
-        audio.save(v2_version=3)
-
-        # Add videoId and release date using ID3
-        id3 = ID3(final_filepath)
-        if video_id:
-            id3.add(TKEY(encoding=3, text=videoId))
-        if publishDate:
-            date_only = publishDate.split("T")[0].replace("-", "")
-            id3.add(COMM(encoding=3, lang='eng', desc='ReleasedDate', text=date_only))
-        id3.save(v2_version=3)
-
-        print(f"✅ Downloaded & tagged: {final_filepath}\n")
+        requested = songdata.get("requested_downloads") or [{}]
+        raw_filepath = requested[0].get("filepath") or engine.ydl.prepare_filename(songdata)
+        # Fetched here so the transcode side never waits on the network
+        with metrics.timer("cover", videoId):
+            cover = fetch_cover(track.coverUrl)
+        return raw_filepath, songdata.get("acodec"), cover
 
     except Exception as e:
         print(f"[ERROR] Failed to download '{title}' from {url}: {e}")
+        manifest.mark(videoId, FAILED, error=str(e))
+        raise
+
+
+def final_path(track):
+    safe_title = sanitize_filename(track.title)
+    safe_artist = sanitize_filename(track.artist)
+    return song_path(DOWNLOAD_FOLDER, track.videoId, f"{safe_title} - {safe_artist}.{AUDIO_FORMAT}")
+
+
+def publish_tagged(track, raw_filepath, source_codec, cover=None):
+    """Encode and tag a track in a single write and publish it atomically.
+
+    The ID3 tag is rendered in memory and written first, ffmpeg's output is
+    streamed in after it, and the file only appears under its final name once
+    complete. A crash leaves either the previous file or nothing.
+    """
+    metrics = get_metrics()
+    final_filepath = final_path(track)
+    with metrics.timer("tag", track.videoId):
+        tag = mp3_tag_bytes(track.title, track.artist, tags=list(track.tags), video_id=track.videoId,
+                            publishDate=track.publishDate, cover=cover)
+    with metrics.timer("ffmpeg", track.videoId):
+        with AtomicFile(final_filepath) as out:
+            out.write(tag)
+            encode_to(raw_filepath, out, AUDIO_FORMAT, source_codec)
+    os.remove(raw_filepath)
+    return final_filepath
+
+
+def convert_and_tag(track, raw_filepath, source_codec, cover=None):
+    """CPU half of a download: transcode the raw audio, rename and tag it."""
+    videoId, title, artist = track.videoId, track.title, track.artist
+    manifest = get_manifest()
+    metrics = get_metrics()
+    try:
+        if STREAM_WRITE:
+            final_filepath = publish_tagged(track, raw_filepath, source_codec, cover)
+            return finish_tagged(track, final_filepath)
 
+        temp_filepath = os.path.join(DOWNLOAD_FOLDER, f"{videoId}.{AUDIO_FORMAT}")
+        with metrics.timer("ffmpeg", videoId):
+            transcode(raw_filepath, temp_filepath, AUDIO_FORMAT, source_codec)
+        os.remove(raw_filepath)
 
-def scan_and_download(tracks_file="data/tracks.json"):
-    if not os.path.exists(tracks_file):
-        print(f"[ERROR] {tracks_file} not found")
-        return
+        if not os.path.exists(temp_filepath):
+            print(f"[ERROR] Expected file not found: {temp_filepath}")
+            manifest.mark(videoId, FAILED, error="expected file not found")
+            return None
+        manifest.mark(videoId, DOWNLOADED, path=temp_filepath)
+
+        # Tag with the writer for the container (ID3, MP4 atoms or Vorbis comments)
+        # while the file still has its temp name, so the final name only ever
+        # points at a tagged file
+        with metrics.timer("tag", videoId):
+            write_tags(temp_filepath, AUDIO_FORMAT, title, artist, tags=list(track.tags),
+                       video_id=videoId, publishDate=track.publishDate, cover=cover)
+
+        final_filepath = final_path(track)
+        with metrics.timer("rename", videoId):
+            os.replace(temp_filepath, final_filepath)
+        return finish_tagged(track, final_filepath)
 
-    with open(tracks_file, "r", encoding="utf-8") as f:
-        try:
-            data = json.load(f)
-        except Exception as e:
-            print(f"[ERROR] Failed to read {tracks_file}: {e}")
-            return
+    except Exception as e:
+        print(f"[ERROR] Failed to convert '{title}': {e}")
+        manifest.mark(videoId, FAILED, error=str(e))
+        raise
+
+
+def finish_tagged(track, final_filepath):
+    """Record a finished, tagged file in the index, the by-name view and the manifest."""
+    get_library().record(track.videoId, final_filepath, track_digest(track))
+    link_by_name(DOWNLOAD_FOLDER, final_filepath)
+    get_manifest().mark(track.videoId, TAGGED, path=final_filepath)
+    print(f"✅ Downloaded & tagged: {final_filepath}\n")
+    return final_filepath
+
+
+def download_mp3(track, output_folder):
+    """Download, transcode and tag one track on the calling thread."""
+    raw = download_raw(track)
+    if not raw:
+        return None
+    return convert_and_tag(track, *raw)
+
+
+def cpu_seconds():
+    """CPU time of this thread plus finished child processes (ffmpeg)."""
+    children = 0.0
+    if resource:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        children = usage.ru_utime + usage.ru_stime
+    return time.thread_time() + children
+
+
+class Transcoder:
+    """Runs the ffmpeg half of each download on its own bounded pool.
+
+    ffmpeg is already a separate process, so one thread per encode is enough
+    to keep every core busy. submit() blocks once `backlog` raw files are
+    waiting, which holds the network workers back when encoding falls behind.
+    """
+
+    def __init__(self, workers=TRANSCODE_WORKERS, backlog=None):
+        self.workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transcode")
+        self._slots = threading.BoundedSemaphore(backlog or self.workers * 2)
+
+    def submit(self, func, *args):
+        self._slots.acquire()
+        future = self._pool.submit(func, *args)
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+def download_track(track, output_folder, transcoder=None):
+    """Download one Track and return its result record.
+
+    With a transcoder only the network half runs on this thread, and a Future
+    of the result record is returned once the encode has been queued.
+    """
+    result = {
+        "videoId": track.videoId,
+        "title": track.title,
+        "artist": track.artist,
+        "path": None,
+        "error": None,
+        "cpu": 0.0,
+    }
+    started = time.perf_counter()
+    # Child CPU time is process-wide, so with several workers the ffmpeg share
+    # of one track can include another track's encoder; totals stay exact.
+    cpu_start = cpu_seconds()
+    raw = None
+    try:
+        raw = download_raw(track)
+    except Exception as e:
+        result["error"] = str(e)
+    result["cpu"] = cpu_seconds() - cpu_start
 
-    if not isinstance(data, list):
-        print(f"[ERROR] {tracks_file} does not contain a list")
-        return
+    if raw and transcoder:
+        return transcoder.submit(finish_track, track, raw, result, started)
+    return finish_track(track, raw, result, started)
 
-    output_folder = os.path.join("Download_Songs")
-    os.makedirs(output_folder, exist_ok=True)
 
-    for item in data:
+def finish_track(track, raw, result, started):
+    """Transcode and tag a downloaded track, completing its result record."""
+    cpu_start = cpu_seconds()
+    if raw:
+        try:
+            result["path"] = convert_and_tag(track, *raw)
+        except Exception as e:
+            result["error"] = str(e)
+    if not result["path"] and not result["error"]:
+        result["error"] = "no file produced"
+    result["cpu"] += cpu_seconds() - cpu_start
+
+    metrics = get_metrics()
+    metrics.observe("total", track.videoId, time.perf_counter() - started)
+    metrics.finish(track.videoId, not result["error"])
+    print(f"[CPU] {result['title']} - {result['artist']}: {result['cpu']:.2f}s ({AUDIO_FORMAT})")
+    return result
+
+
+def pending_tracks(tracks_file, output_folder):
+    """Lazily yield the Tracks that still need downloading."""
+    # Tracks already tagged on disk (or out of retries) are skipped, so a rerun
+    # after a crash picks up where the previous one stopped
+    for item in iter_tracks(tracks_file):
         if not isinstance(item, dict):
             continue
-
-        videoId = item.get("videoId")
-        title = item.get("title")
-        artist = item.get("artist")
-        coverUrl = item.get("coverUrl")
-        description = item.get("description")
-        urlCanonical = item.get("urlCanonical")
-        viewCount = item.get("viewCount")
-        publishDate = item.get("publishDate")
-        category = item.get("category")
-        tags = item.get("tags")
-
-        if not title or not artist:
+        track = Track.from_dict(item)
+        if not track.title or not track.artist:
             continue
+        if is_done(track.videoId):
+            print(f"[SKIP] {track.title} - {track.artist} already done")
+            continue
+        print(f"[INFO] Queued {track.title} - {track.artist} -> {output_folder}")
+        yield track
+
 
-        print(f"[INFO] Downloading {title} - {artist} -> {output_folder}")
-        
-        # Call your download function with all required fields
-        download_mp3(
-            videoId=videoId,
-            title=title,
-            artist=artist,
-            coverUrl=coverUrl,
-            description=description,
-            urlCanonical=urlCanonical,
-            viewCount=viewCount,
-            publishDate=publishDate,
-            category=category,
-            tags=tags,
-            output_folder=output_folder
-        )
+def scan_and_download(tracks_file="data/tracks.jsonl", workers=DOWNLOAD_WORKERS,
+                      transcode_workers=TRANSCODE_WORKERS):
+    tracks_file = resolve_tracks_file(tracks_file)
+    if not os.path.exists(tracks_file):
+        print(f"[ERROR] {tracks_file} not found")
+        return []
+
+    output_folder = os.path.join("Download_Songs")
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Temp files are named after the videoId and final names after title/artist,
+    # so output filenames do not depend on the order workers finish in.
+    workers = max(1, workers)
+    results = []
+    try:
+        tracks = pending_tracks(tracks_file, output_folder)
+        if workers == 1:
+            for track in tracks:
+                results.append(download_track(track, output_folder))
+        else:
+            # Network workers only fetch raw audio and hand it to the transcode
+            # pool, so the two sides are sized independently (NIC vs cores)
+            transcoder = Transcoder(transcode_workers)
+            in_flight = deque()
+            try:
+                # Keep only a small window of tracks in flight so the file is read
+                # as the workers free up rather than all at once
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    for track in tracks:
+                        in_flight.append(pool.submit(download_track, track, output_folder, transcoder))
+                        if len(in_flight) >= workers * 2:
+                            results.append(in_flight.popleft().result())
+            finally:
+                # Tracks already handed to the workers still finish and are reported
+                results.extend(f.result() for f in in_flight)
+                transcoder.shutdown()
+    except Exception as e:
+        # download_track records per-track failures itself, so this is the
+        # tracks file (or the pools) giving out: stop queueing, keep what ran
+        print(f"[ERROR] Stopped queueing tracks from {tracks_file}: {e}")
+    finally:
+        engines.close_all()
+    # With a transcoder, results hold Futures; the pool has shut down, so all are done
+    results = [r.result() if isinstance(r, Future) else r for r in results]
+
+    failed = [r for r in results if r["error"]]
+    if results:
+        total_cpu = sum(r["cpu"] for r in results)
+        print(f"[INFO] CPU time ({AUDIO_FORMAT}): {total_cpu:.2f}s total, "
+              f"{total_cpu / len(results):.2f}s per track")
+    print(f"[INFO] Finished {len(results)} tracks with {workers} download / "
+          f"{transcode_workers if workers > 1 else 0} transcode worker(s): "
+          f"{len(results) - len(failed)} ok, {len(failed)} failed")
+    for r in failed:
+        print(f"[ERROR] {r['title']} - {r['artist']} ({r['videoId']}): {r['error']}")
+    get_metrics().export("download")
+    print(f"[INFO] Manifest: {get_manifest().summary()}")
+    print_stats()
+    print_cover_stats()
+    print_rate_stats()
+    return results
 
 
 
@@ -0,0 +1,136 @@
+import argparse
+import hashlib
+import os
+import sys
+
+from library_index import get_library, tag_digest
+from manifest import get_manifest, TAGGED
+from tag_scanner import AUDIO_EXTENSIONS, scan_file
+
+DOWNLOAD_FOLDER = "Download_Songs"
+# "flat" keeps every song directly in Download_Songs; "sharded" nests them in
+# subdirectories picked by a hash of the videoId, e.g. Download_Songs/3/f/Title - Artist.mp3
+LAYOUT = os.getenv("LIBRARY_LAYOUT", "flat")
+# Nesting depth and hex digits per level: 2 x 1 gives 256 leaf directories
+SHARD_LEVELS = int(os.getenv("SHARD_LEVELS", "2"))
+SHARD_WIDTH = int(os.getenv("SHARD_WIDTH", "1"))
+# With the sharded layout, Download_Songs/by-name/ holds a "Title - Artist" symlink per song
+BY_NAME_VIEW = os.getenv("BY_NAME_VIEW", "1") == "1"
+BY_NAME_FOLDER = "by-name"
+
+if LAYOUT not in ("flat", "sharded"):
+    raise ValueError(f"Unsupported LIBRARY_LAYOUT {LAYOUT!r}, expected flat or sharded")
+
+
+def shard_dir(folder, videoId):
+    digest = hashlib.sha1(videoId.encode("utf-8")).hexdigest()
+    parts = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)]
+    return os.path.join(folder, *parts)
+
+
+def song_path(folder, videoId, filename, layout=None):
+    """Where a song's file lives in the configured layout; creates its shard directory."""
+    if (layout or LAYOUT) == "flat" or not videoId:
+        return os.path.join(folder, filename)
+    directory = shard_dir(folder, videoId)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+def link_by_name(folder, path, layout=None):
+    """Point by-name/<file name> at a sharded song (replacing an older link of that name)."""
+    if (layout or LAYOUT) == "flat" or not BY_NAME_VIEW:
+        return
+    view = os.path.join(folder, BY_NAME_FOLDER)
+    os.makedirs(view, exist_ok=True)
+    link = os.path.join(view, os.path.basename(path))
+    target = os.path.relpath(path, view)
+    try:
+        # Build the link under a temporary name and swap it in, so it never dangles half-made
+        tmp = f"{link}.{os.getpid()}.tmp"
+        os.symlink(target, tmp)
+        os.replace(tmp, link)
+    except OSError as e:  # e.g. Windows without symlink rights: the index still has every path
+        print(f"[WARN] Could not link {link}: {e}")
+
+
+def flat_files(folder):
+    """Audio files directly in folder (not symlinks, not in shard directories)."""
+    with os.scandir(folder) as entries:
+        return sorted(e.path for e in entries
+                      if e.is_file(follow_symlinks=False) and e.name.lower().endswith(AUDIO_EXTENSIONS))
+
+
+def migrate(folder=DOWNLOAD_FOLDER, dry_run=False):
+    """Move a flat library into the sharded layout, keeping the index and manifest in step.
+
+    The videoId comes from the library index, or from the file's tags when the
+    index doesn't know the file. Files without a videoId stay where they are.
+    """
+    library = get_library()
+    manifest = get_manifest()
+    moved = skipped = 0
+    for path in flat_files(folder):
+        videoId = library.video_id_for(path)
+        if not videoId:
+            _, values, error = scan_file(path)
+            if not values:
+                print(f"[SKIP] {os.path.basename(path)}: {error or 'no videoId tag'}")
+                skipped += 1
+                continue
+            videoId, digest = values["video_id"], tag_digest(**values)
+        else:
+            digest = library.get(videoId)["tagDigest"]
+
+        target = os.path.join(shard_dir(folder, videoId), os.path.basename(path))
+        if os.path.exists(target):
+            print(f"[WARN] {target} already exists, leaving {os.path.basename(path)} in place")
+            skipped += 1
+            continue
+        if dry_run:
+            print(f"[INFO] Would move {path} -> {target}")
+            moved += 1
+            continue
+        target = song_path(folder, videoId, os.path.basename(path), layout="sharded")
+        os.replace(path, target)
+        library.record(videoId, target, digest)
+        manifest.mark(videoId, TAGGED, path=target)
+        link_by_name(folder, target, layout="sharded")
+        moved += 1
+    print(f"[INFO] {'Would move' if dry_run else 'Moved'} {moved} files into the sharded layout, "
+          f"{skipped} left in place")
+    return moved
+
+
+def rebuild_links(folder=DOWNLOAD_FOLDER):
+    """Recreate the by-name view from the library index."""
+    view = os.path.join(folder, BY_NAME_FOLDER)
+    if os.path.isdir(view):
+        with os.scandir(view) as entries:
+            for e in entries:
+                if e.is_symlink():
+                    os.remove(e.path)
+    # Only sharded songs; files still in the flat top level need no link
+    paths = [p for p in get_library().paths(folder)
+             if os.path.normpath(os.path.dirname(p)) != os.path.normpath(folder)]
+    for path in paths:
+        link_by_name(folder, path, layout="sharded")
+    print(f"[INFO] Linked {len(paths)} songs in {view}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Download_Songs layout.")
+    parser.add_argument("command", choices=("migrate", "links"),
+                        help="migrate: move a flat library into shards; links: rebuild the by-name view")
+    parser.add_argument("folder", nargs="?", default=DOWNLOAD_FOLDER)
+    parser.add_argument("--dry-run", action="store_true", help="only print what migrate would move")
+    args = parser.parse_args()
+    if args.command == "migrate":
+        migrate(args.folder, dry_run=args.dry_run)
+    else:
+        rebuild_links(args.folder)
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding="utf-8")
+    main()
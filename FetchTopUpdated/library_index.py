@@ -0,0 +1,168 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from tagging import join_tags, release_date
+from tag_scanner import scan_folder
+
+LIBRARY_INDEX_PATH = os.getenv("LIBRARY_INDEX", os.path.join(".cache", "library.sqlite3"))
+DOWNLOAD_FOLDER = "Download_Songs"
+
+
+def tag_digest(title, artist, composer=None, video_id=None, released=None):
+    """Digest of the tag values as stored in the file (composer joined, date as YYYYMMDD)."""
+    values = [title or "", artist or "", composer or "", video_id or "", released or ""]
+    return hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()
+
+
+def track_digest(track):
+    """Digest of the tags write_tags stores for a Track."""
+    return tag_digest(track.title, track.artist, join_tags(list(track.tags)), track.videoId,
+                      release_date(track.publishDate))
+
+
+class LibraryIndex:
+    """Tagged files on disk, keyed by the videoId stored in their tags.
+
+    Rows are written as each file is tagged, so "is this song already here"
+    is one primary-key lookup plus one stat of the indexed path, whatever the
+    file's title-based name is now.
+    """
+
+    def __init__(self, path=LIBRARY_INDEX_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS library ("
+            " video_id TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, mtime REAL NOT NULL,"
+            " tag_digest TEXT, indexed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS library_path ON library (path)")
+        self._conn.commit()
+
+    def record(self, video_id, path, digest=None):
+        """Index (or re-index) the file at path as video_id's copy."""
+        if not video_id:
+            return
+        st = os.stat(path)
+        with self._lock:
+            # A path holds one song: drop whatever videoId was indexed there before
+            self._conn.execute("DELETE FROM library WHERE path = ? AND video_id != ?", (path, video_id))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO library (video_id, path, size, mtime, tag_digest, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, path, st.st_size, st.st_mtime, digest, time.time()),
+            )
+            self._conn.commit()
+
+    def get(self, video_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, size, mtime, tag_digest FROM library WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"path": row[0], "size": row[1], "mtime": row[2], "tagDigest": row[3]}
+
+    def video_id_for(self, path):
+        """The videoId indexed at path, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT video_id FROM library WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def has(self, video_id):
+        """True if video_id's indexed file is still on disk at the indexed size."""
+        entry = self.get(video_id) if video_id else None
+        if entry is None:
+            return False
+        try:
+            size = os.stat(entry["path"]).st_size
+        except FileNotFoundError:
+            self.remove(video_id)
+            return False
+        return size == entry["size"]
+
+    def remove(self, video_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM library WHERE video_id = ?", (video_id,))
+            self._conn.commit()
+
+    def paths(self, folder=None):
+        """Indexed file paths (optionally only those under folder), in a stable order."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path FROM library ORDER BY path").fetchall()
+        paths = [r[0] for r in rows]
+        if folder:
+            prefix = os.path.join(os.path.normpath(folder), "")
+            paths = [p for p in paths if os.path.normpath(p).startswith(prefix)]
+        return paths
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM library").fetchone()[0]
+
+    def rebuild(self, folder=DOWNLOAD_FOLDER):
+        """Bring the index in line with what is on disk under folder.
+
+        Files whose size and mtime match their row are not opened; the rest have
+        their tags read by the header scanner. Rows for files that are gone are
+        dropped. For existing libraries and files moved by hand.
+        """
+        start = time.time()
+        prefix = os.path.join(os.path.normpath(folder), "")
+        with self._lock:
+            rows = self._conn.execute("SELECT video_id, path, size, mtime FROM library").fetchall()
+        known = {p: (size, mtime) for _, p, size, mtime in rows}
+        changed, unchanged = scan_folder(folder, known)
+
+        now = time.time()
+        entries, untagged = [], []
+        for path, size, mtime, values, error in changed:
+            if error:
+                print(f"[WARN] Could not read tags from {path}: {error}")
+            if values:
+                entries.append((values["video_id"], path, size, mtime, tag_digest(**values), now))
+            else:
+                untagged.append(path)
+        on_disk = set(unchanged) | {e[1] for e in entries}
+        stale = [(v,) for v, p, _, _ in rows if p not in on_disk and os.path.normpath(p).startswith(prefix)]
+        with self._lock:
+            self._conn.executemany("DELETE FROM library WHERE video_id = ?", stale)
+            # A changed file may now carry another videoId, or none
+            self._conn.executemany("DELETE FROM library WHERE path = ?", [(c[0],) for c in changed])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO library (video_id, path, size, mtime, tag_digest, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)", entries)
+            self._conn.commit()
+        print(f"[INFO] Library index: {len(entries)} files (re)indexed, {len(unchanged)} unchanged, "
+              f"{len(untagged)} without a videoId tag, {len(stale)} stale entries removed "
+              f"in {time.time() - start:.1f}s")
+        return len(entries)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def get_library():
+    """Return the process-wide library index, opening it on first use."""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = LibraryIndex()
+        return _library
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding="utf-8")
+    get_library().rebuild(sys.argv[1] if len(sys.argv) > 1 else DOWNLOAD_FOLDER)
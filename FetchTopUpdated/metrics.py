@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Off by default; METRICS=1 turns on per-track stage timings and the exports
+METRICS_ENABLED = os.getenv("METRICS", "0") not in ("", "0", "false", "no")
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_NULL_TIMER = nullcontext()
+
+
+class NullMetrics:
+    """Stand-in used when metrics are off: every call is a no-op."""
+
+    enabled = False
+
+    def timer(self, stage, video_id):
+        return _NULL_TIMER
+
+    def observe(self, stage, video_id, seconds):
+        pass
+
+    def add_bytes(self, video_id, count):
+        pass
+
+    def add_retries(self, video_id, count):
+        pass
+
+    def finish(self, video_id, ok):
+        pass
+
+    def ydl_hooks(self):
+        return {}
+
+    def export(self, job):
+        pass
+
+
+class RunMetrics:
+    """Per-track stage timings, bytes and retries for one run, plus histograms."""
+
+    enabled = True
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.tracks = {}
+        self.histograms = {}
+        self._hook_starts = {}
+        self._lock = threading.Lock()
+
+    def _track(self, video_id):
+        track = self.tracks.get(video_id)
+        if track is None:
+            track = self.tracks[video_id] = {"videoId": video_id, "stages": {}, "bytes": 0,
+                                             "retries": 0, "status": None}
+        return track
+
+    @contextmanager
+    def timer(self, stage, video_id):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, video_id, time.perf_counter() - start)
+
+    def observe(self, stage, video_id, seconds):
+        with self._lock:
+            stages = self._track(video_id)["stages"]
+            stages[stage] = stages.get(stage, 0.0) + seconds
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += seconds
+            hist["count"] += 1
+
+    def add_bytes(self, video_id, count):
+        with self._lock:
+            self._track(video_id)["bytes"] += count or 0
+
+    def add_retries(self, video_id, count):
+        with self._lock:
+            self._track(video_id)["retries"] += count or 0
+
+    def finish(self, video_id, ok):
+        with self._lock:
+            self._track(video_id)["status"] = "ok" if ok else "failed"
+
+    # --- yt-dlp hooks ---
+
+    def _progress_hook(self, d):
+        """Splits the network transfer out of extract_info and counts its bytes."""
+        video_id = d.get("info_dict", {}).get("id")
+        key = (video_id, "download")
+        if d["status"] == "downloading":
+            with self._lock:
+                self._hook_starts.setdefault(key, time.perf_counter())
+        elif d["status"] in ("finished", "error"):
+            with self._lock:
+                start = self._hook_starts.pop(key, None)
+            if start is not None:
+                self.observe("download", video_id, time.perf_counter() - start)
+            if d["status"] == "finished":
+                self.add_bytes(video_id, d.get("total_bytes") or d.get("downloaded_bytes"))
+
+    def _postprocessor_hook(self, d):
+        """Times the FFmpeg postprocessors (the transcode) separately from the download."""
+        if not d.get("postprocessor", "").startswith("FFmpeg"):
+            return
+        video_id = d.get("info_dict", {}).get("id")
+        key = (video_id, d["postprocessor"])
+        if d["status"] == "started":
+            with self._lock:
+                self._hook_starts[key] = time.perf_counter()
+        elif d["status"] == "finished":
+            with self._lock:
+                start = self._hook_starts.pop(key, None)
+            if start is not None:
+                self.observe("ffmpeg", video_id, time.perf_counter() - start)
+
+    def ydl_hooks(self):
+        """Extra YoutubeDL options that feed download/ffmpeg timings into this run."""
+        return {"progress_hooks": [self._progress_hook], "postprocessor_hooks": [self._postprocessor_hook]}
+
+    # --- export ---
+
+    def summary(self):
+        with self._lock:
+            tracks = list(self.tracks.values())
+            histograms = {stage: dict(h, buckets=list(h["buckets"])) for stage, h in self.histograms.items()}
+        return {
+            "type": "summary",
+            "startedAt": self.started_at,
+            "duration": time.time() - self.started_at,
+            "tracks": len(tracks),
+            "ok": sum(1 for t in tracks if t["status"] == "ok"),
+            "failed": sum(1 for t in tracks if t["status"] == "failed"),
+            "bytes": sum(t["bytes"] for t in tracks),
+            "retries": sum(t["retries"] for t in tracks),
+            "buckets": list(BUCKETS),
+            "stages": histograms,
+        }
+
+    def export(self, job):
+        """Write {job}-{timestamp}.jsonl (one line per track, then a summary) and {job}.prom."""
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        summary = self.summary()
+        timestamp = datetime.fromtimestamp(self.started_at).strftime("%Y%m%d_%H%M%S")
+        jsonl_path = os.path.join(METRICS_DIR, f"{job}-{timestamp}.jsonl")
+        with self._lock:
+            tracks = [dict(t, type="track") for t in self.tracks.values()]
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            for record in tracks + [summary]:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        # node_exporter's textfile collector may read at any moment, so swap the file in whole
+        prom_path = os.path.join(METRICS_DIR, f"{job}.prom")
+        with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(prometheus_text(job, summary))
+        os.replace(prom_path + ".tmp", prom_path)
+        print(f"[INFO] Metrics written to {jsonl_path} and {prom_path}")
+
+
+def prometheus_text(job, summary):
+    label = f'job="{job}"'
+    lines = [
+        "# HELP song_pipeline_stage_seconds Time spent per track in each stage.",
+        "# TYPE song_pipeline_stage_seconds histogram",
+    ]
+    for stage, hist in sorted(summary["stages"].items()):
+        for bound, count in zip(BUCKETS, hist["buckets"]):
+            lines.append(f'song_pipeline_stage_seconds_bucket{{{label},stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'song_pipeline_stage_seconds_bucket{{{label},stage="{stage}",le="+Inf"}} {hist["count"]}')
+        lines.append(f'song_pipeline_stage_seconds_sum{{{label},stage="{stage}"}} {hist["sum"]:.6f}')
+        lines.append(f'song_pipeline_stage_seconds_count{{{label},stage="{stage}"}} {hist["count"]}')
+    lines += [
+        "# HELP song_pipeline_tracks Tracks handled in the last run, by outcome.",
+        "# TYPE song_pipeline_tracks gauge",
+        f'song_pipeline_tracks{{{label},status="ok"}} {summary["ok"]}',
+        f'song_pipeline_tracks{{{label},status="failed"}} {summary["failed"]}',
+        "# HELP song_pipeline_downloaded_bytes Bytes downloaded in the last run.",
+        "# TYPE song_pipeline_downloaded_bytes gauge",
+        f"song_pipeline_downloaded_bytes{{{label}}} {summary['bytes']}",
+        "# HELP song_pipeline_retries Download retries in the last run.",
+        "# TYPE song_pipeline_retries gauge",
+        f"song_pipeline_retries{{{label}}} {summary['retries']}",
+        "# HELP song_pipeline_run_duration_seconds Wall time of the last run.",
+        "# TYPE song_pipeline_run_duration_seconds gauge",
+        f"song_pipeline_run_duration_seconds{{{label}}} {summary['duration']:.3f}",
+        "# HELP song_pipeline_last_run_timestamp_seconds When the last run started.",
+        "# TYPE song_pipeline_last_run_timestamp_seconds gauge",
+        f"song_pipeline_last_run_timestamp_seconds{{{label}}} {summary['startedAt']:.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics recorder (a no-op one unless METRICS is set)."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = RunMetrics() if METRICS_ENABLED else NullMetrics()
+        return _metrics
@@ -0,0 +1,310 @@
+import os
+import sys
+import queue
+import threading
+import time
+from dataclasses import replace
+
+from yt_trending import fetch_song_data, TRACK_LIMIT, METADATA_WORKERS
+from download_song import (DOWNLOAD_FOLDER, DOWNLOAD_WORKERS, TRANSCODE_WORKERS, AUDIO_FORMAT,
+                           YDL_OPTS, STREAM_WRITE, is_done, final_path, publish_tagged, finish_tagged)
+from manifest import get_manifest, DOWNLOADED, FAILED
+from metadata_cache import print_stats
+from metrics import get_metrics
+from rate_limiter import get_limiter, print_stats as print_rate_stats
+from cover_cache import fetch_cover, print_stats as print_cover_stats
+from tagging import write_tags
+from transcode import transcode
+from ydl_engine import EnginePool
+from tracks_io import TracksWriter
+from batch_fetch import PLAYLIST_IDS, fetch_charts, merge_charts, reusable_from_snapshots, save_snapshots
+from uploader import Uploader, UPLOAD_WORKERS
+
+TRACKS_FILE = os.path.join("data", "tracks.jsonl")
+
+# Per-stage concurrency and the size of the queue in front of each stage
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", str(METADATA_WORKERS)))
+TAG_WORKERS = int(os.getenv("TAG_WORKERS", "1"))
+QUEUE_SIZE = int(os.getenv("QUEUE_SIZE", "8"))
+REPORT_INTERVAL = float(os.getenv("QUEUE_REPORT_INTERVAL", "5"))
+# UPLOAD=1 adds an upload stage that sends each song as soon as it is tagged
+UPLOAD = os.getenv("UPLOAD", "0") == "1"
+
+# The download stage only fetches the source audio; ffmpeg runs in the transcode stage
+RAW_YDL_OPTS = {**YDL_OPTS, "quiet": True}
+
+STOP = object()
+
+
+class Stage:
+    """A pool of worker threads that read jobs from a bounded inbox queue.
+
+    func returns the job to hand to the next stage, or None to drop it. With an
+    executor (anything with submit(func, *args) -> Future, e.g. a long-lived
+    download pool or a Transcoder) each job runs there instead of on the
+    stage's own thread, so per-thread state outlives the run.
+    """
+
+    def __init__(self, name, func, workers, inbox, outbox=None, on_error=None, executor=None):
+        self.name = name
+        self.func = func
+        self.executor = executor
+        self.workers = max(1, workers)
+        self.inbox = inbox
+        self.outbox = outbox
+        self.on_error = on_error
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _run(self):
+        while True:
+            self.max_depth = max(self.max_depth, self.inbox.qsize())
+            job = self.inbox.get()
+            if job is STOP:
+                return
+            try:
+                if self.executor:
+                    out = self.executor.submit(self.func, job).result()
+                else:
+                    out = self.func(job)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                if self.on_error:
+                    self.on_error(self.name, job, e)
+                continue
+            with self._lock:
+                self.processed += 1
+            if out is not None and self.outbox is not None:
+                self.outbox.put(out)
+
+    def stop(self):
+        """Wait for the inbox to drain, then stop every worker."""
+        for _ in self._threads:
+            self.inbox.put(STOP)
+        for t in self._threads:
+            t.join()
+
+
+class Pipeline:
+    """fetch -> download -> transcode -> tag (-> upload), connected by bounded queues.
+
+    A track starts downloading as soon as its own metadata arrives instead of
+    waiting for the whole playlist to be fetched. A long-running caller can pass
+    its own engines, download_pool and transcoder; they are left open after run().
+    """
+
+    def __init__(self, fetch_workers=FETCH_WORKERS, download_workers=DOWNLOAD_WORKERS,
+                 transcode_workers=TRANSCODE_WORKERS, tag_workers=TAG_WORKERS, queue_size=QUEUE_SIZE,
+                 uploader=None, upload_workers=UPLOAD_WORKERS, engines=None, download_pool=None,
+                 transcoder=None):
+        self.manifest = get_manifest()
+        self.metrics = get_metrics()
+        # Engines are per thread, so a borrowed pool only stays warm on the borrowed download_pool
+        self.owns_engines = engines is None
+        self.engines = engines or EnginePool(RAW_YDL_OPTS)
+        self.writer = None
+        # Fetched records wait here until every earlier playlist entry is written
+        self.pending_records = {}
+        self.next_record = 1
+        # Carried over from the previous chart snapshot, and this run's records for the next one
+        self.reused = {}
+        self.fetched_at = {}
+        self.tracks = {}
+        self.membership = {}
+        self.results = {}
+        self._lock = threading.Lock()
+
+        self.uploader = uploader
+        self.queues = {name: queue.Queue(maxsize=queue_size)
+                       for name in ("fetch", "download", "transcode", "tag", "upload")}
+        upload_queue = self.queues["upload"] if uploader else None
+        self.stages = [
+            Stage("fetch", self.fetch, fetch_workers, self.queues["fetch"], self.queues["download"], self.fail),
+            Stage("download", self.download, download_workers, self.queues["download"], self.queues["transcode"],
+                  self.fail, executor=download_pool),
+            Stage("transcode", self.transcode, transcode_workers, self.queues["transcode"], self.queues["tag"],
+                  self.fail, executor=transcoder),
+            Stage("tag", self.tag, tag_workers, self.queues["tag"], upload_queue, self.fail),
+        ]
+        if uploader:
+            self.stages.append(Stage("upload", self.upload, upload_workers, upload_queue, None, self.upload_failed))
+
+    # --- stages ---
+
+    def fetch(self, job):
+        idx, videoId = job
+        track = self.reused.get(videoId)
+        if track:
+            self.manifest.mark_fetched(videoId)
+        else:
+            track = fetch_song_data(videoId)
+            if track:
+                self.fetched_at[videoId] = time.time()
+        if track:
+            track = replace(track, playlists=self.membership.get(videoId, ()))
+        self.save_track(idx, track)
+        if not track:
+            return None
+        if not track.title or not track.artist:
+            return None
+        if is_done(videoId):
+            print(f"[SKIP] {track.title} - {track.artist} already done")
+            return None
+        print(f"[{idx}] {track.title} - {track.urlCanonical}", file=sys.stderr)
+        return {"idx": idx, "track": track}
+
+    def download(self, job):
+        track = job["track"]
+        videoId = track.videoId
+        self.manifest.begin(videoId)
+        if self.metrics.enabled:
+            self.metrics.add_retries(videoId, (self.manifest.get(videoId) or {}).get("attempts", 1) - 1)
+        print(f"✅ Starting download: {track.title} | Artist: {track.artist} | VideoID: {videoId}")
+
+        engine = self.engines.get()
+        info = get_limiter("youtube").call(engine.download, track.url, RAW_YDL_OPTS["outtmpl"],
+                                           on_retry=lambda: self.metrics.add_retries(videoId, 1))
+        requested = info.get("requested_downloads") or [{}]
+        job["raw"] = requested[0].get("filepath") or engine.ydl.prepare_filename(info)
+        job["codec"] = info.get("acodec")
+        with self.metrics.timer("cover", videoId):
+            job["cover"] = fetch_cover(track.coverUrl)
+        return job
+
+    def transcode(self, job):
+        videoId = job["track"].videoId
+        if STREAM_WRITE:
+            # Encoded, tagged and published in one write; the tag stage only records it
+            job["path"] = publish_tagged(job["track"], job["raw"], job["codec"], job.get("cover"))
+            return job
+        temp_filepath = os.path.join(DOWNLOAD_FOLDER, f"{videoId}.{AUDIO_FORMAT}")
+        with self.metrics.timer("ffmpeg", videoId):
+            transcode(job["raw"], temp_filepath, AUDIO_FORMAT, job["codec"])
+        os.remove(job["raw"])
+        job["temp"] = temp_filepath
+        self.manifest.mark(videoId, DOWNLOADED, path=temp_filepath)
+        return job
+
+    def tag(self, job):
+        track = job["track"]
+        final_filepath = job.get("path")
+        if not final_filepath:
+            # Tag under the temp name and only then publish, so a crash never
+            # leaves an untagged file under the final name
+            with self.metrics.timer("tag", track.videoId):
+                write_tags(job["temp"], AUDIO_FORMAT, track.title, track.artist, tags=list(track.tags),
+                           video_id=track.videoId, publishDate=track.publishDate, cover=job.get("cover"))
+            final_filepath = final_path(track)
+            with self.metrics.timer("rename", track.videoId):
+                os.replace(job["temp"], final_filepath)
+        finish_tagged(track, final_filepath)
+        self.metrics.finish(track.videoId, True)
+        with self._lock:
+            self.results[track.videoId] = {"path": final_filepath, "error": None}
+        job["path"] = final_filepath
+        return job
+
+    def upload(self, job):
+        with self.metrics.timer("upload", job["track"].videoId):
+            self.uploader.upload(job["path"])
+
+    def fail(self, stage, job, error):
+        if isinstance(job, tuple):
+            idx, videoId = job
+            self.save_track(idx, None)
+        else:
+            videoId = job["track"].videoId
+        print(f"[ERROR] {stage} failed for {videoId}: {error}")
+        self.manifest.mark(videoId, FAILED, error=f"{stage}: {error}")
+        self.metrics.finish(videoId, False)
+        with self._lock:
+            self.results[videoId] = {"path": None, "error": f"{stage}: {error}"}
+
+    def upload_failed(self, stage, job, error):
+        # The song is still tagged on disk; the next run's upload picks it up again
+        print(f"[ERROR] Upload failed for {os.path.basename(job['path'])}: {error}")
+
+    # --- driver ---
+
+    def report_queues(self, done):
+        while not done.wait(REPORT_INTERVAL):
+            depths = [f"{s.name}={s.inbox.qsize()}/{s.inbox.maxsize}" for s in self.stages]
+            print(f"[QUEUE] {' '.join(depths)}", file=sys.stderr)
+
+    def run(self, playlist_id, limit=TRACK_LIMIT):
+        return self.run_batch([playlist_id], limit)
+
+    def run_batch(self, playlist_ids, limit=TRACK_LIMIT):
+        """Run several playlists through one pipeline; a song on many charts is processed once."""
+        charts = fetch_charts(playlist_ids, limit)
+        if not charts:
+            return None
+        videoIds, self.membership = merge_charts(charts)
+        self.reused, self.fetched_at = reusable_from_snapshots(charts)
+
+        os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+        start = time.time()
+        done = threading.Event()
+        reporter = threading.Thread(target=self.report_queues, args=(done,), daemon=True)
+        reporter.start()
+        for stage in self.stages:
+            stage.start()
+
+        self.writer = TracksWriter(TRACKS_FILE)
+        try:
+            for idx, videoId in enumerate(videoIds, start=1):
+                self.queues["fetch"].put((idx, videoId))
+            # Stopping in order lets each stage drain before its consumers are told to stop
+            for stage in self.stages:
+                stage.stop()
+        finally:
+            done.set()
+            if self.owns_engines:
+                self.engines.close_all()
+            if self.uploader:
+                self.uploader.close()
+            self.writer.close()
+
+        save_snapshots(charts, self.tracks, self.fetched_at)
+        print(f"[INFO] Saved {self.writer.count} tracks to {TRACKS_FILE}", file=sys.stderr)
+        elapsed = time.time() - start
+        for stage in self.stages:
+            print(f"[INFO] Stage {stage.name}: {stage.processed} ok, {stage.failed} failed, "
+                  f"{stage.workers} worker(s), max queue depth {stage.max_depth}")
+        print(f"[INFO] Pipeline finished {len(self.results)} tracks in {elapsed:.1f}s")
+        print(f"[INFO] Manifest: {self.manifest.summary()}")
+        print_stats()
+        print_cover_stats()
+        print_rate_stats()
+        self.metrics.export("pipeline")
+        return self.results
+
+    def save_track(self, idx, track):
+        """Append fetched records to the tracks file in playlist order as they arrive."""
+        with self._lock:
+            self.pending_records[idx] = track
+            while self.next_record in self.pending_records:
+                record = self.pending_records.pop(self.next_record)
+                if record:
+                    self.tracks[record.videoId] = record
+                    self.writer.write(record.to_dict())
+                self.next_record += 1
+
+
+def main():
+    # Same charts as batch_fetch.py (PLAYLIST_IDS), run as one batch with each song processed once
+    Pipeline(uploader=Uploader() if UPLOAD else None).run_batch(PLAYLIST_IDS)
+
+
+if __name__ == "__main__":
+    main()
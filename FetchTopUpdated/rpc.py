@@ -0,0 +1,122 @@
+"""Newline-delimited JSON-RPC 2.0 over stdin/stdout for the long-running workers the Node scripts drive.
+
+Each request line is {"jsonrpc": "2.0", "id": 1, "method": "download",
+"params": {...}}. While a job runs, the worker streams {"method": "progress",
+"params": {"id": 1, "stage": ..., "videoId": ...}} notifications, then sends
+the job's response with the same id. Jobs run one at a time, in the order they
+arrive. The scripts' own log lines go to stderr, so stdout only carries
+protocol lines.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+JOB_FAILED = -32000
+
+
+class InvalidParams(ValueError):
+    pass
+
+
+class RpcWorker:
+    """Dispatches request lines to the job methods in self.methods.
+
+    A job method takes (params, emit) and returns the JSON result; emit(stage,
+    videoId, **fields) sends a progress notification for that request.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.started_at = time.time()
+        self.jobs = 0
+        self._out_lock = threading.Lock()
+        self.methods = {"ping": self.ping}
+
+    def send(self, message):
+        line = json.dumps({"jsonrpc": "2.0", **message}, ensure_ascii=False)
+        with self._out_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def progress(self, request_id):
+        """Return an emit(stage, videoId, **fields) that streams events for one request."""
+        def emit(stage, videoId, **fields):
+            self.send({"method": "progress",
+                       "params": {"id": request_id, "stage": stage, "videoId": videoId, **fields}})
+        return emit
+
+    def handle(self, line):
+        """Run one request line; returns False once the worker should exit."""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self.send({"id": None, "error": {"code": PARSE_ERROR, "message": f"Invalid JSON: {e}"}})
+            return True
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            self.send({"id": None, "error": {"code": INVALID_REQUEST, "message": "Expected a request object"}})
+            return True
+
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            self.send({"id": request_id, "error": {"code": INVALID_PARAMS, "message": "params must be an object"}})
+            return True
+        if method == "shutdown":
+            self.send({"id": request_id, "result": {"jobs": self.jobs}})
+            return False
+        if method not in self.methods:
+            self.send({"id": request_id, "error": {"code": METHOD_NOT_FOUND, "message": f"Unknown method {method}"}})
+            return True
+
+        if method != "ping":
+            print(f"[INFO] Job {request_id}: {method}", file=sys.stderr)
+            self.jobs += 1
+        try:
+            result = self.methods[method](params, self.progress(request_id))
+        except InvalidParams as e:
+            self.send({"id": request_id, "error": {"code": INVALID_PARAMS, "message": f"Invalid params: {e}"}})
+        except Exception as e:
+            print(f"[ERROR] Job {request_id} ({method}) failed: {e}", file=sys.stderr)
+            self.send({"id": request_id, "error": {"code": JOB_FAILED, "message": str(e)}})
+        else:
+            self.send({"id": request_id, "result": result})
+        return True
+
+    def serve(self, stream):
+        for line in stream:
+            if line.strip() and not self.handle(line):
+                break
+
+    def close(self):
+        pass
+
+    def ping(self, params, emit):
+        return {"pid": os.getpid(), "uptime": round(time.time() - self.started_at, 1), "jobs": self.jobs}
+
+
+def run(worker_class, warm_up=None):
+    """Serve requests from stdin with a worker_class until shutdown or end of input."""
+    # Keep fd 1 for protocol lines only; prints, yt-dlp and ffmpeg output all go to stderr
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdin.reconfigure(encoding="utf-8")
+
+    worker = worker_class(protocol)
+    if warm_up:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    print(f"[INFO] Python worker ready (pid {os.getpid()})", file=sys.stderr)
+    worker.send({"method": "ready", "params": {"pid": os.getpid()}})
+    try:
+        worker.serve(sys.stdin)
+    finally:
+        worker.close()
+        print(f"[INFO] Python worker stopped after {worker.jobs} jobs", file=sys.stderr)
@@ -0,0 +1,85 @@
+import json
+import os
+import time
+
+from track import Track
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(".cache", "snapshots"))
+# Carried-over tracks older than this are fetched again anyway
+SNAPSHOT_TTL = int(os.getenv("SNAPSHOT_TTL", str(7 * 24 * 3600)))
+
+
+def snapshot_path(playlist_id):
+    return os.path.join(SNAPSHOT_DIR, f"{playlist_id}.json")
+
+
+def load_snapshot(playlist_id):
+    """The previous run's chart for playlist_id, or None on the first run."""
+    path = snapshot_path(playlist_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+
+def save_snapshot(playlist_id, videoIds, tracks, fetched_at):
+    """Store this run's chart order and the Track records behind it.
+
+    tracks maps videoId to Track, fetched_at maps videoId to when its metadata
+    was fetched (carried-over tracks keep their original time).
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    snapshot = {
+        "playlistId": playlist_id,
+        "takenAt": time.time(),
+        "videoIds": list(videoIds),
+        "tracks": {v: {"fetchedAt": fetched_at[v], "track": tracks[v].to_dict()}
+                   for v in videoIds if v in tracks},
+    }
+    path = snapshot_path(playlist_id)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def diff_snapshot(previous, videoIds):
+    """Compare the new chart order with the previous snapshot.
+
+    Returns {"added": [...], "removed": [...], "moved": [(videoId, old_pos, new_pos)]}
+    with 1-based chart positions.
+    """
+    old_ids = previous["videoIds"] if previous else []
+    old_pos = {v: i for i, v in enumerate(old_ids, start=1)}
+    new_pos = {v: i for i, v in enumerate(videoIds, start=1)}
+    return {
+        "added": [v for v in videoIds if v not in old_pos],
+        "removed": [v for v in old_ids if v not in new_pos],
+        "moved": [(v, old_pos[v], new_pos[v]) for v in videoIds
+                  if v in old_pos and old_pos[v] != new_pos[v]],
+    }
+
+
+def reusable_tracks(previous, videoIds, now=None):
+    """Tracks from the previous snapshot that are still on the chart and fresh enough.
+
+    Returns (videoId -> Track, videoId -> fetchedAt).
+    """
+    if not previous:
+        return {}, {}
+    now = now or time.time()
+    tracks, fetched_at = {}, {}
+    for v in videoIds:
+        entry = previous.get("tracks", {}).get(v)
+        if entry and now - entry.get("fetchedAt", 0) < SNAPSHOT_TTL:
+            tracks[v] = Track.from_dict(entry["track"])
+            fetched_at[v] = entry["fetchedAt"]
+    return tracks, fetched_at
+
+
+def print_diff(diff, reused, file=None, label="Chart"):
+    print(f"[INFO] {label} diff: {len(diff['added'])} added, {len(diff['removed'])} removed, "
+          f"{len(diff['moved'])} moved; reusing {reused} tracks", file=file)
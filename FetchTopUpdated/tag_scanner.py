@@ -0,0 +1,195 @@
+import os
+import struct
+
+# Processes used to read tags when many files changed since the last scan
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", str(os.cpu_count() or 1)))
+# Below this many files a process pool costs more than it saves
+POOL_THRESHOLD = 256
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".opus")
+
+# ID3v2 text frames the library needs, and the value each one holds
+TEXT_FRAMES = {b"TIT2": "title", b"TPE1": "artist", b"TCOM": "composer", b"TKEY": "video_id"}
+ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+NULLS = {0: b"\x00", 1: b"\x00\x00", 2: b"\x00\x00", 3: b"\x00"}
+
+# Where write_m4a_tags / write_opus_tags keep each value
+M4A_KEYS = {
+    "title": "\xa9nam", "artist": "\xa9ART", "composer": "\xa9wrt",
+    "video_id": "----:com.apple.iTunes:videoId", "released": "----:com.apple.iTunes:ReleasedDate",
+}
+VORBIS_KEYS = {
+    "title": "title", "artist": "artist", "composer": "composer",
+    "video_id": "videoid", "released": "releaseddate",
+}
+
+
+class Unsupported(Exception):
+    """The tag uses a feature the header scanner doesn't handle; read it with mutagen instead."""
+
+
+def syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def decode_text(encoding, data):
+    """First value of an ID3 text payload."""
+    if encoding not in ENCODINGS:
+        raise Unsupported(f"text encoding {encoding}")
+    null = NULLS[encoding]
+    # Split on a terminator that starts at a character boundary
+    width = len(null)
+    for i in range(0, len(data) - width + 1, width):
+        if data[i:i + width] == null:
+            data = data[:i]
+            break
+    return data.decode(ENCODINGS[encoding], errors="replace")
+
+
+def split_comment(data):
+    """COMM payload -> (description, text)."""
+    encoding = data[0]
+    if encoding not in ENCODINGS:
+        raise Unsupported(f"text encoding {encoding}")
+    body = data[4:]  # skip the encoding byte and the 3-byte language
+    null, width = NULLS[encoding], len(NULLS[encoding])
+    for i in range(0, len(body) - width + 1, width):
+        if body[i:i + width] == null:
+            return decode_text(encoding, body[:i]), decode_text(encoding, body[i + width:])
+    return decode_text(encoding, body), ""
+
+
+def scan_id3(path):
+    """Read title, artist, composer, videoId and ReleasedDate from an MP3's ID3v2 tag.
+
+    Only the 10-byte tag header, each frame header and the payloads of the
+    frames we want are read; everything else (APIC cover art, padding, the
+    audio) is seeked over. Returns None when the file has no videoId tag.
+    """
+    values = dict.fromkeys(("title", "artist", "composer", "video_id", "released"))
+    with open(path, "rb", buffering=0) as f:
+        header = f.read(10)
+        if len(header) < 10 or header[:3] != b"ID3":
+            return None
+        major, flags = header[3], header[5]
+        if major not in (3, 4):
+            raise Unsupported(f"ID3v2.{major}")
+        if flags & 0x80:
+            raise Unsupported("unsynchronised tag")
+        end = 10 + syncsafe(header[6:10])
+        pos = 10
+        if flags & 0x40:  # extended header: v2.3 size excludes itself, v2.4 includes it
+            ext = f.read(4)
+            pos += syncsafe(ext) if major == 4 else 4 + struct.unpack(">I", ext)[0]
+
+        wanted = len(TEXT_FRAMES) + 1
+        while pos + 10 <= end and wanted:
+            f.seek(pos)
+            frame = f.read(10)
+            frame_id = frame[:4]
+            if len(frame) < 10 or frame_id[:1] == b"\x00":
+                break  # padding
+            size = syncsafe(frame[4:8]) if major == 4 else struct.unpack(">I", frame[4:8])[0]
+            if pos + 10 + size > end:
+                raise Unsupported(f"{frame_id.decode('latin-1')} frame runs past the end of the tag")
+            pos += 10 + size
+            if frame_id not in TEXT_FRAMES and frame_id != b"COMM":
+                continue
+            if frame[9] & (0x0F if major == 4 else 0xC0):
+                raise Unsupported(f"{frame_id.decode()} is compressed, encrypted or unsynchronised")
+            data = f.read(size)
+            if not data:
+                continue
+            if frame_id == b"COMM":
+                desc, text = split_comment(data)
+                if desc == "ReleasedDate" and values["released"] is None:
+                    values["released"] = text
+                    wanted -= 1
+            elif values[TEXT_FRAMES[frame_id]] is None:
+                values[TEXT_FRAMES[frame_id]] = decode_text(data[0], data[1:])
+                wanted -= 1
+    return values if values["video_id"] else None
+
+
+def read_tags(path):
+    """Stored tag values of an audio file via mutagen, or None when it has no videoId tag."""
+    from mutagen import File
+
+    audio = File(path)
+    if audio is None or audio.tags is None:
+        return None
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".mp3":
+        tags = audio.tags
+        values = {
+            "title": tags.get("TIT2"), "artist": tags.get("TPE1"), "composer": tags.get("TCOM"),
+            "video_id": tags.get("TKEY"), "released": tags.get("COMM:ReleasedDate:eng"),
+        }
+        values = {k: str(v.text[0]) if v else None for k, v in values.items()}
+        return values if values["video_id"] else None
+
+    def first(key):
+        value = audio.tags.get(key)
+        if not value:
+            return None
+        # MP4 freeform atoms hold bytes, everything else is already text
+        return value[0].decode("utf-8") if isinstance(value[0], bytes) else str(value[0])
+
+    keys = M4A_KEYS if ext == ".m4a" else VORBIS_KEYS
+    values = {field: first(key) for field, key in keys.items()}
+    return values if values["video_id"] else None
+
+
+def scan_file(path):
+    """Tag values for one file: header scan for MP3s, mutagen for everything else.
+
+    Returns (path, values or None, error or None); runs in the scan processes.
+    """
+    try:
+        if path.lower().endswith(".mp3"):
+            try:
+                return path, scan_id3(path), None
+            except Unsupported:
+                pass
+        return path, read_tags(path), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def walk_audio_files(folder):
+    """Yield (path, size, mtime) for every audio file below folder."""
+    stack = [folder]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                    st = entry.stat(follow_symlinks=False)
+                    yield entry.path, st.st_size, st.st_mtime
+
+
+def scan_folder(folder, known=None, workers=SCAN_WORKERS):
+    """Read tags of every audio file below folder that changed since the last scan.
+
+    known maps path -> (size, mtime) from the previous scan; files that still
+    match are not opened. Returns (changed, unchanged_paths) where changed is a
+    list of (path, size, mtime, values or None, error or None).
+    """
+    known = known or {}
+    stats, unchanged = {}, []
+    for path, size, mtime in walk_audio_files(folder):
+        if known.get(path) == (size, mtime):
+            unchanged.append(path)
+        else:
+            stats[path] = (size, mtime)
+
+    paths = sorted(stats)
+    if len(paths) >= POOL_THRESHOLD and workers > 1:
+        # multiprocessing is only imported when a big scan needs it
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            scanned = list(pool.map(scan_file, paths, chunksize=max(1, len(paths) // (workers * 8))))
+    else:
+        scanned = [scan_file(p) for p in paths]
+    return [(path, *stats[path], values, error) for path, values, error in scanned], unchanged
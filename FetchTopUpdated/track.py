@@ -0,0 +1,108 @@
+import os
+from dataclasses import dataclass, fields
+
+# Fields the pipeline actually uses. Anything else from get_song is dropped
+# when a Track is built; override with e.g. TRACK_FIELDS=title,artist,viewCount
+DEFAULT_PROJECTION = ("title", "artist", "coverUrl", "urlCanonical", "publishDate", "tags")
+PROJECTION = tuple(f.strip() for f in os.getenv("TRACK_FIELDS", ",".join(DEFAULT_PROJECTION)).split(",") if f.strip())
+
+
+def _renderer(metadata):
+    return metadata.get("microformat", {}).get("microformatDataRenderer", {})
+
+
+def _cover_url(metadata):
+    thumbnails = _renderer(metadata).get("thumbnail", {}).get("thumbnails", [])
+    return thumbnails[0]["url"] if thumbnails else None
+
+
+# How each field is read out of a ytmusic.get_song response
+EXTRACTORS = {
+    "title": lambda m: m.get("videoDetails", {}).get("title"),
+    "artist": lambda m: m.get("videoDetails", {}).get("author"),
+    "coverUrl": _cover_url,
+    "description": lambda m: _renderer(m).get("description"),
+    "urlCanonical": lambda m: m.get("videoDetails", {}).get("video_url"),
+    "viewCount": lambda m: m.get("videoDetails", {}).get("viewCount"),
+    "publishDate": lambda m: _renderer(m).get("publishDate"),
+    "category": lambda m: m.get("videoDetails", {}).get("category"),
+    "tags": lambda m: _renderer(m).get("tags"),
+}
+
+# Fail on import rather than with a KeyError on the first song of the run
+for _name in PROJECTION:
+    if _name not in EXTRACTORS:
+        raise ValueError(f"Unknown field {_name!r} in TRACK_FIELDS; expected some of: {', '.join(EXTRACTORS)}")
+
+
+@dataclass(frozen=True, slots=True)
+class Track:
+    """Compact, immutable record for one song, keyed by videoId.
+
+    Attribute names match the keys in the tracks files, so to_dict/from_dict
+    round-trip without any renaming.
+    """
+
+    videoId: str | None = None
+    title: str | None = None
+    artist: str | None = None
+    coverUrl: str | None = None
+    description: str | None = None
+    urlCanonical: str | None = None
+    viewCount: str | None = None
+    publishDate: str | None = None
+    category: str | None = None
+    tags: tuple = ()
+    # (playlistId, position) for every chart the track appeared on this run
+    playlists: tuple = ()
+
+    @classmethod
+    def from_metadata(cls, videoId, metadata, projection=PROJECTION):
+        """Build a Track from a get_song response, keeping only the projected fields."""
+        values = {}
+        for name in projection:
+            value = EXTRACTORS[name](metadata)
+            if value is not None:
+                values[name] = tuple(value) if name == "tags" else value
+        return cls(videoId=videoId, **values)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a Track from a tracks-file record; unknown keys are ignored."""
+        values = {f.name: data[f.name] for f in fields(cls) if data.get(f.name) is not None}
+        if isinstance(values.get("tags"), (list, tuple)):
+            values["tags"] = tuple(values["tags"])
+        elif "tags" in values:
+            values["tags"] = (str(values["tags"]),)
+        if "playlists" in values:
+            values["playlists"] = tuple(tuple(p) for p in values["playlists"])
+        return cls(**values)
+
+    def to_dict(self):
+        """Serialize for the tracks file, leaving out empty fields."""
+        data = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if value is None or value == ():
+                continue
+            if f.name == "tags":
+                value = list(value)
+            elif f.name == "playlists":
+                value = [list(p) for p in value]
+            data[f.name] = value
+        return data
+
+    @property
+    def url(self):
+        return self.urlCanonical or f"https://music.youtube.com/watch?v={self.videoId}"
+
+    @property
+    def deep_links(self):
+        """App deep links, derived on demand rather than stored with every record."""
+        return {
+            "iosAppArguments": f"https://music.youtube.com/watch?v={self.videoId}",
+            "urlApplinksIos": f"vnd.youtube.music://music.youtube.com/watch?v={self.videoId}&feature=applinks",
+            "urlApplinksAndroid": f"vnd.youtube.music://music.youtube.com/watch?v={self.videoId}&feature=applinks",
+            "urlTwitterIos": f"vnd.youtube.music://music.youtube.com/watch?v={self.videoId}&feature=twitter-deep-link",
+            "urlTwitterAndroid": f"vnd.youtube.music://music.youtube.com/watch?v={self.videoId}&feature=twitter-deep-link",
+        }
@@ -0,0 +1,59 @@
+import shutil
+import subprocess
+import tempfile
+
+MP3_BITRATE = "192k"
+
+
+def codec_args(audio_format, source_codec=None):
+    """ffmpeg audio codec arguments for the requested output format."""
+    source_codec = (source_codec or "").lower()
+    if audio_format == "mp3":
+        return ["-codec:a", "libmp3lame", "-b:a", MP3_BITRATE]
+    if audio_format == "m4a":
+        # AAC sources are copied as-is; anything else has to be encoded
+        if source_codec.startswith("mp4a") or source_codec == "aac":
+            return ["-codec:a", "copy"]
+        return ["-codec:a", "aac", "-b:a", MP3_BITRATE]
+    if audio_format == "opus":
+        if source_codec == "opus":
+            return ["-codec:a", "copy"]
+        return ["-codec:a", "libopus", "-b:a", "160k"]
+    raise ValueError(f"Unsupported audio format: {audio_format}")
+
+
+def transcode(src, dst, audio_format, source_codec=None):
+    """Convert the raw download at src into dst with ffmpeg."""
+    cmd = ["ffmpeg", "-y", "-nostdin", "-loglevel", "error", "-i", src, "-vn",
+           *codec_args(audio_format, source_codec), dst]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {proc.returncode}: {proc.stderr.strip()[-500:]}")
+    return dst
+
+
+# Formats whose muxer can write to a pipe; MP4 needs a seekable output
+STREAM_FORMATS = {"mp3"}
+# Bytes copied from ffmpeg's stdout at a time
+STREAM_CHUNK = 256 * 1024
+
+
+def encode_to(src, out, audio_format, source_codec=None):
+    """Encode src with ffmpeg and stream the audio into the open binary file out.
+
+    ffmpeg writes no tags of its own (and no Xing frame it can't seek back to
+    fill in), so the caller can put its own tag in front of the stream.
+    """
+    if audio_format not in STREAM_FORMATS:
+        raise ValueError(f"Can't stream {audio_format} output, expected one of {', '.join(STREAM_FORMATS)}")
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", src, "-vn", "-map_metadata", "-1",
+           *codec_args(audio_format, source_codec), "-id3v2_version", "0", "-write_xing", "0",
+           "-f", audio_format, "pipe:1"]
+    # stderr goes to a file so a chatty ffmpeg can't block on a full pipe while we read stdout
+    with tempfile.TemporaryFile() as err:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err) as proc:
+            shutil.copyfileobj(proc.stdout, out, STREAM_CHUNK)
+        if proc.returncode != 0:
+            err.seek(0)
+            message = err.read().decode("utf-8", errors="replace").strip()[-500:]
+            raise RuntimeError(f"ffmpeg exited with {proc.returncode}: {message}")
@@ -0,0 +1,174 @@
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Same endpoint and admin account SongUploadingAutomation.js uses; override in CI
+API_BASE = os.getenv("UPLOAD_API_BASE", "https://music-streaming-app-jse6.onrender.com/api").rstrip("/")
+ADMIN_EMAIL = os.getenv("UPLOAD_EMAIL", "admin@test.com")
+ADMIN_PASSWORD = os.getenv("UPLOAD_PASSWORD", "admin123")
+
+DOWNLOAD_FOLDER = "Download_Songs"
+# Multipart uploads in flight at once; also the size of the keep-alive pool
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "300"))
+UPLOAD_LOG_PATH = os.getenv("UPLOAD_LOG", os.path.join(".cache", "uploads.sqlite3"))
+
+
+class UploadLog:
+    """Files the server has already accepted, so reruns only send new ones."""
+
+    def __init__(self, path=UPLOAD_LOG_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, uploaded_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def is_uploaded(self, path):
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM uploads WHERE path = ?", (path,)).fetchone()
+        return row is not None and row[0] == os.path.getsize(path)
+
+    def record(self, path):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (path, size, uploaded_at) VALUES (?, ?, ?)",
+                (path, os.path.getsize(path), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def sanitize_upload_name(filename):
+    """Same rule as the JS uploader: keep word chars, dashes, spaces and dots, max 80 chars."""
+    return re.sub(r"[^\w\- .]+", "", filename, flags=re.ASCII)[:80]
+
+
+class Uploader:
+    """Uploads MP3s to the admin API over one pooled keep-alive session.
+
+    Safe to call from several threads; a 401 triggers a single re-login that
+    the other threads then reuse.
+    """
+
+    def __init__(self, api_base=API_BASE, email=ADMIN_EMAIL, password=ADMIN_PASSWORD,
+                 workers=UPLOAD_WORKERS, log=None):
+        # requests is only imported when an upload actually happens
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.api_base = api_base
+        self.email = email
+        self.password = password
+        self.log = log or UploadLog()
+        self.session = requests.Session()
+        # Retry only failed connects: a multipart body can't be replayed mid-stream
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers),
+                              max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=1))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._token = None
+        self._token_lock = threading.Lock()
+
+    def login(self, stale_token=None):
+        """Log in and return a token; concurrent callers with the same stale token share one login."""
+        with self._token_lock:
+            if self._token and self._token != stale_token:
+                return self._token
+            res = self.session.post(f"{self.api_base}/auth/admin/login",
+                                    json={"email": self.email, "password": self.password}, timeout=60)
+            res.raise_for_status()
+            self._token = res.json()["token"]
+            print("[INFO] Logged in, token received ✅")
+            return self._token
+
+    def _post(self, path, token):
+        with open(path, "rb") as f:
+            files = {"audio": (sanitize_upload_name(os.path.basename(path)), f, "audio/mpeg")}
+            return self.session.post(f"{self.api_base}/admin/upload-automated-python-yt", files=files,
+                                     headers={"Authorization": f"Bearer {token}"}, timeout=UPLOAD_TIMEOUT)
+
+    def upload(self, path):
+        """Upload one file; returns True when sent, False when it was already uploaded."""
+        if self.log.is_uploaded(path):
+            print(f"[SKIP] {os.path.basename(path)} already uploaded")
+            return False
+        token = self._token or self.login()
+        res = self._post(path, token)
+        if res.status_code == 401:
+            res = self._post(path, self.login(stale_token=token))
+        res.raise_for_status()
+        self.log.record(path)
+        print(f"[UPLOAD] {os.path.basename(path)} ✅")
+        return True
+
+    def close(self):
+        self.session.close()
+
+
+def list_mp3_files(folder):
+    """All .mp3 files below folder, in a stable order. Symlinks (the by-name view) are skipped."""
+    found = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        found.extend(p for p in (os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".mp3"))
+                     if not os.path.islink(p))
+    return found
+
+
+def upload_all(folder=DOWNLOAD_FOLDER, workers=UPLOAD_WORKERS, uploader=None):
+    """Upload every MP3 under folder that isn't in the upload log yet."""
+    if not os.path.isdir(folder):
+        print(f"[ERROR] Folder not found: {folder}")
+        return {}
+    # The folder, not the library index, decides what gets sent: files downloaded
+    # before the index existed or dropped in by hand have no row there
+    files = list_mp3_files(folder)
+    if not files:
+        print("[WARN] No MP3 files found.")
+        return {}
+    print(f"[INFO] Found {len(files)} MP3 files ✅")
+
+    uploader = uploader or Uploader(workers=workers)
+    results = {}
+
+    def upload_one(path):
+        try:
+            results[path] = "uploaded" if uploader.upload(path) else "skipped"
+        except Exception as e:
+            results[path] = f"error: {e}"
+            print(f"[ERROR] Upload failed for {os.path.basename(path)}: {e}")
+
+    start = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(upload_one, files))
+    finally:
+        uploader.close()
+
+    counts = {}
+    for status in results.values():
+        key = "failed" if status.startswith("error") else status
+        counts[key] = counts.get(key, 0) + 1
+    print(f"[INFO] 🎉 Uploads finished in {time.time() - start:.1f}s: "
+          f"{counts.get('uploaded', 0)} uploaded, {counts.get('skipped', 0)} skipped, "
+          f"{counts.get('failed', 0)} failed")
+    return results
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding="utf-8")
+    upload_all()
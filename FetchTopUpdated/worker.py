@@ -0,0 +1,209 @@
+"""Long-running worker the Node scripts send jobs to instead of spawning a new python per stage.
+
+Speaks newline-delimited JSON-RPC 2.0 over stdin/stdout (see rpc.py). The
+YTMusic client, the per-thread YoutubeDL engines, the download and transcode
+pools and the metadata/cover caches stay open between jobs; the pipeline job
+runs its downloads and encodes on those same pools.
+
+Methods:
+    ping                                      -> {"pid", "uptime", "jobs"}
+    fetch_playlist {playlistIds, limit}       -> {"tracksFile", "videoIds"}
+    download       {videoIds, tracksFile}     -> {"ok", "failed", "skipped", "results"}
+    pipeline       {playlistIds, limit, upload} -> {"ok", "failed", "results"}
+    shutdown                                  -> {"jobs"}
+"""
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ytmusic_utils import get_ytmusic
+from yt_trending import fetch_song_data, TRACK_LIMIT
+from download_song import (DOWNLOAD_FOLDER, DOWNLOAD_WORKERS, TRANSCODE_WORKERS, Transcoder,
+                           download_track, engines, is_done)
+from batch_fetch import fetch_batch_metadata, TRACKS_FILE
+from pipeline import Pipeline, PLAYLIST_IDS, UPLOAD
+from manifest import get_manifest
+from metadata_cache import print_stats
+from metrics import get_metrics
+from rate_limiter import print_stats as print_rate_stats
+from cover_cache import print_stats as print_cover_stats
+from tracks_io import iter_tracks, resolve_tracks_file
+from track import Track
+from uploader import Uploader
+from rpc import RpcWorker, InvalidParams, run
+
+
+class ReportingPipeline(Pipeline):
+    """Pipeline that reports each track's progress as it moves through the stages."""
+
+    def __init__(self, emit, **kwargs):
+        super().__init__(**kwargs)
+        self.emit = emit
+
+    def fetch(self, job):
+        out = super().fetch(job)
+        if out:
+            track = out["track"]
+            self.emit("fetched", track.videoId, title=track.title, artist=track.artist)
+        return out
+
+    def tag(self, job):
+        out = super().tag(job)
+        self.emit("tagged", out["track"].videoId, path=out["path"])
+        return out
+
+    def upload(self, job):
+        super().upload(job)
+        self.emit("uploaded", job["track"].videoId, path=job["path"])
+
+    def fail(self, stage, job, error):
+        super().fail(stage, job, error)
+        videoId = job[1] if isinstance(job, tuple) else job["track"].videoId
+        self.emit("failed", videoId, error=f"{stage}: {error}")
+
+
+def load_tracks(tracks_file, videoIds):
+    """Tracks for videoIds from a tracks file; ids it doesn't have are left out."""
+    wanted = set(videoIds)
+    tracks = {}
+    tracks_file = resolve_tracks_file(tracks_file)
+    if not os.path.exists(tracks_file):
+        return tracks
+    for item in iter_tracks(tracks_file):
+        if isinstance(item, dict) and item.get("videoId") in wanted:
+            tracks[item["videoId"]] = Track.from_dict(item)
+    return tracks
+
+
+def playlist_ids_param(params):
+    playlist_ids = params.get("playlistIds") or ([params["playlistId"]] if params.get("playlistId") else PLAYLIST_IDS)
+    if not isinstance(playlist_ids, list) or not all(isinstance(p, str) for p in playlist_ids):
+        raise InvalidParams("playlistIds must be a list of strings")
+    return playlist_ids
+
+
+class Worker(RpcWorker):
+    def __init__(self, out):
+        super().__init__(out)
+        # Kept for the worker's lifetime so each thread's YoutubeDL engine stays warm
+        self.downloads = ThreadPoolExecutor(max_workers=max(1, DOWNLOAD_WORKERS), thread_name_prefix="download")
+        self.transcoder = Transcoder(TRANSCODE_WORKERS)
+        self.methods.update({
+            "fetch_playlist": self.fetch_playlist,
+            "download": self.download,
+            "pipeline": self.pipeline,
+        })
+
+    def close(self):
+        self.downloads.shutdown(wait=True)
+        self.transcoder.shutdown()
+        engines.close_all()
+
+    # --- jobs ---
+
+    def fetch_playlist(self, params, emit):
+        """Fetch metadata for one or more playlists into the tracks file."""
+        tracks = fetch_batch_metadata(
+            playlist_ids_param(params), params.get("limit", TRACK_LIMIT),
+            on_track=lambda t: emit("fetched", t.videoId, title=t.title, artist=t.artist),
+        )
+        return {"tracksFile": TRACKS_FILE, "videoIds": list(tracks)}
+
+    def download(self, params, emit):
+        """Download, transcode and tag the given videoIds.
+
+        Metadata comes from the tracks file when it has the id, else it is fetched.
+        """
+        videoIds = params.get("videoIds")
+        if not isinstance(videoIds, list):
+            raise InvalidParams("videoIds must be a list")
+        tracks = load_tracks(params.get("tracksFile", TRACKS_FILE), videoIds)
+        manifest = get_manifest()
+        os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+
+        results, skipped = [], []
+        results_lock = threading.Lock()
+        reported = threading.Semaphore(0)
+
+        def report(result):
+            with results_lock:
+                results.append(result)
+            if result["error"]:
+                emit("failed", result["videoId"], error=result["error"])
+            else:
+                emit("tagged", result["videoId"], path=result["path"])
+            reported.release()
+
+        def settle(future):
+            # The download pool hands back either the result or a Future of it from the transcoder
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"videoId": future.videoId, "path": None, "error": str(e)}
+            if isinstance(result, Future):
+                result.add_done_callback(settle)
+            else:
+                report(result)
+
+        submitted = 0
+        for videoId in videoIds:
+            track = tracks.get(videoId) or fetch_song_data(videoId)
+            if not track or not track.title or not track.artist:
+                report({"videoId": videoId, "path": None, "error": "no metadata"})
+                submitted += 1
+                continue
+            if is_done(videoId):
+                print(f"[SKIP] {track.title} - {track.artist} already done", file=sys.stderr)
+                skipped.append(videoId)
+                emit("skipped", videoId)
+                continue
+            emit("queued", videoId, title=track.title, artist=track.artist)
+            future = self.downloads.submit(download_track, track, DOWNLOAD_FOLDER, self.transcoder)
+            future.videoId = videoId
+            future.add_done_callback(settle)
+            submitted += 1
+
+        # Wait for every report, so all progress lines are written before the response
+        for _ in range(submitted):
+            reported.acquire()
+
+        failed = [r for r in results if r["error"]]
+        print(f"[INFO] Manifest: {manifest.summary()}", file=sys.stderr)
+        print_stats(file=sys.stderr)
+        print_cover_stats(file=sys.stderr)
+        print_rate_stats(file=sys.stderr)
+        get_metrics().export("download")
+        return {
+            "ok": len(results) - len(failed),
+            "failed": len(failed),
+            "skipped": len(skipped),
+            "results": [{"videoId": r["videoId"], "path": r["path"], "error": r["error"]} for r in results],
+        }
+
+    def pipeline(self, params, emit):
+        """Fetch and download one or more playlists as a single streaming pipeline."""
+        upload = params.get("upload", UPLOAD)
+        # Same engines and pools as the download job, so nothing is rebuilt per run
+        pipeline = ReportingPipeline(emit, uploader=Uploader() if upload else None, engines=engines,
+                                     download_pool=self.downloads, transcoder=self.transcoder)
+        results = pipeline.run_batch(playlist_ids_param(params), params.get("limit", TRACK_LIMIT)) or {}
+        failed = sum(1 for r in results.values() if r["error"])
+        return {"ok": len(results) - failed, "failed": failed, "results": results}
+
+
+def warm_up():
+    """Build the YTMusic client and import yt-dlp while the first job is on its way."""
+    try:
+        get_ytmusic()
+        import yt_dlp  # noqa: F401
+    except Exception as e:
+        print(f"[WARN] Warm-up failed: {e}", file=sys.stderr)
+
+
+def main():
+    run(Worker, warm_up)
+
+
+if __name__ == "__main__":
+    main()
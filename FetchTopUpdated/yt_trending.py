@@ -1,88 +1,90 @@
-import json
 import os
-from ytmusicapi import YTMusic
 import sys
-import io
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from ytmusic_utils import get_ytmusic
+from metadata_cache import cached_get_song, print_stats
+from manifest import get_manifest
+from metrics import get_metrics
+from rate_limiter import print_stats as print_rate_stats
+from tracks_io import TracksWriter
+from track import Track
+from snapshot import load_snapshot, save_snapshot, diff_snapshot, reusable_tracks, print_diff
 
 # Fix stdout for unicode
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+sys.stdout.reconfigure(encoding='utf-8')
+sys.stderr.reconfigure(encoding='utf-8')
 
-def fetch_playlist_full_metadata(playlist_id):
-    ytmusic = YTMusic()
-    
-    try:
-        playlist = ytmusic.get_playlist(playlist_id, limit=100)
-    except Exception as e:
-        print("[ERROR] Failed to fetch playlist:", e, file=sys.stderr)
-        return
+# How many playlist entries to process and how many get_song calls run at once
+TRACK_LIMIT = int(os.getenv("TRACK_LIMIT", "1"))
+METADATA_WORKERS = int(os.getenv("METADATA_WORKERS", "8"))
 
-    all_songs_data = []
 
-    for idx, track in enumerate(playlist["tracks"], start=1):
-        
-        videoId = track.get("videoId")
-        if idx>1:
-            break
-        if not videoId:
-            continue
+def fetch_song_data(videoId):
+    """Fetch full metadata for one playlist track as a Track, or None if it failed."""
+    try:
+        # Fetch full metadata for each song
+        with get_metrics().timer("metadata", videoId):
+            metadata = cached_get_song(get_ytmusic(), videoId)
+    except Exception as e:
+        print(f"[ERROR] Failed to fetch metadata for {videoId}: {e}", file=sys.stderr)
+        return None
+    get_manifest().mark_fetched(videoId)
 
-        try:
-            # Fetch full metadata for each song
-            metadata = ytmusic.get_song(videoId)
-        except Exception as e:
-            print(f"[ERROR] Failed to fetch metadata for {videoId}: {e}", file=sys.stderr)
-            continue
+    # Keep only the projected fields instead of the raw metadata blobs
+    return Track.from_metadata(videoId, metadata)
 
-        thumbnails = metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("thumbnail", {}).get("thumbnails", [])
-        coverUrl = thumbnails[0]["url"] if thumbnails else None
 
-        pub_date_str = metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("publishDate")
-        
+def fetch_playlist_full_metadata(playlist_id, limit=TRACK_LIMIT, workers=METADATA_WORKERS):
+    try:
+        playlist = get_ytmusic().get_playlist(playlist_id, limit=100)
+    except Exception as e:
+        print("[ERROR] Failed to fetch playlist:", e, file=sys.stderr)
+        return
 
-        # Extract essential fields
-        song_data = {
-           "videoId": videoId,
-            "title": metadata.get("videoDetails", {}).get("title"),
-            "artist": metadata.get("videoDetails", {}).get("author"),
-            "coverUrl": coverUrl,
-            "description": metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("tags"),
-            "urlCanonical": metadata.get("videoDetails", {}).get("video_url"),
-            "viewCount": metadata.get("videoDetails", {}).get("viewCount"),
-            "publishDate": pub_date_str,
-            "category": metadata.get("videoDetails", {}).get("category"),
-            "tags": metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("tags"),
+    videoIds = [track.get("videoId") for track in playlist["tracks"][:limit]]
 
-            #"streamingData": metadata.get("streamingData"),
-            #"playabilityStatus": metadata.get("playabilityStatus"),
-            "videoDetails": metadata.get("videoDetails"),
-            #"microformat": metadata.get("microformat"),
-            #"siteName": "YouTube Music",
-            #"appName": "YouTube Music",
-            #"androidPackage": "com.google.android.apps.youtube.music",
-            #"iosAppStoreId": "1017492454",
-            #"urls": {
-                #"iosAppArguments": f"https://music.youtube.com/watch?v={videoId}",
-                #"urlApplinksIos": f"vnd.youtube.music://music.youtube.com/watch?v={videoId}&feature=applinks",
-                #"urlApplinksAndroid": f"vnd.youtube.music://music.youtube.com/watch?v={videoId}&feature=applinks",
-                #"urlTwitterIos": f"vnd.youtube.music://music.youtube.com/watch?v={videoId}&feature=twitter-deep-link",
-                #"urlTwitterAndroid": f"vnd.youtube.music://music.youtube.com/watch?v={videoId}&feature=twitter-deep-link",
-           # }
-        }
+    # The chart changes little from day to day: only tracks new to it (or whose
+    # carried-over record has gone stale) get a full get_song call
+    previous = load_snapshot(playlist_id)
+    chart = [v for v in videoIds if v]
+    reused, fetched_at = reusable_tracks(previous, chart)
+    print_diff(diff_snapshot(previous, chart), len(reused), file=sys.stderr)
 
-        all_songs_data.append(song_data)
-        print(f"[{idx}] {song_data['title']} - {song_data['urlCanonical']}", file=sys.stderr)
+    def get_track(videoId):
+        if not videoId:
+            return None
+        if videoId in reused:
+            get_manifest().mark_fetched(videoId)
+            return reused[videoId]
+        track = fetch_song_data(videoId)
+        if track:
+            fetched_at[videoId] = time.time()
+        return track
 
-    # Save all songs in JSON
-    os.makedirs("data", exist_ok=True)
+    # Songs are appended to a JSON-lines file as they arrive instead of being
+    # collected and dumped at the end
     #timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"data/tracks.json"
+    filename = f"data/tracks.jsonl"
+
+    # map() yields results in playlist order no matter which call finishes first
+    with TracksWriter(filename) as writer, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(get_track, videoIds)
 
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(all_songs_data, f, ensure_ascii=False, indent=2)
+        tracks = {}
+        for idx, track in enumerate(results, start=1):
+            if not track:
+                continue
+            tracks[track.videoId] = track
+            writer.write(track.to_dict())
+            print(f"[{idx}] {track.title} - {track.urlCanonical}", file=sys.stderr)
 
+    save_snapshot(playlist_id, chart, tracks, fetched_at)
     print(f"[INFO] Saved full playlist metadata to {filename}", file=sys.stderr)
+    print_stats(file=sys.stderr)
+    print_rate_stats(file=sys.stderr)
+    get_metrics().export("metadata")
 
 if __name__ == "__main__":
     playlist_id = "PL4fGSI1pDJn40WjZ6utkIuj2rNg-7iGsq"
@@ -1,12 +1,37 @@
 import json
-from ytmusicapi import YTMusic
+import threading
+from metadata_cache import cached_get_song
+from rate_limiter import RateLimited
+
+_ytmusic = None
+_ytmusic_lock = threading.Lock()
+
+
+def get_ytmusic():
+    """Return the shared YTMusic client, importing ytmusicapi and building it on first use.
+
+    Every call on it (get_song, get_playlist, ...) goes through the "ytmusic"
+    rate limiter, whichever module makes it.
+    """
+    global _ytmusic
+    with _ytmusic_lock:
+        if _ytmusic is None:
+            from ytmusicapi import YTMusic
+            _ytmusic = RateLimited(YTMusic(), "ytmusic")
+        return _ytmusic
+
+
+def __getattr__(name):
+    # Keeps `from ytmusic_utils import ytmusic` working without an eager client
+    if name == "ytmusic":
+        return get_ytmusic()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-ytmusic = YTMusic()
 
 def get_song_by_id(video_id: str) -> dict | None:
     """Fetch song metadata from YouTube Music by video ID."""
     try:
-        metadata = ytmusic.get_song(video_id)
+        metadata = cached_get_song(get_ytmusic(), video_id)
         thumbnails = metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("thumbnail", {}).get("thumbnails", [])
         coverUrl = thumbnails[0]["url"] if thumbnails else None
         pub_date_str = metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("publishDate")
@@ -1,11 +1,12 @@
 import os
-import json
-from yt_dlp import YoutubeDL
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import ID3, ID3NoHeaderError, TKEY, COMM
 import sys
 import io
 from ytmusic_utils import get_song_by_id
+from metadata_cache import print_stats
+from rate_limiter import get_limiter, print_stats as print_rate_stats
+from tracks_io import iter_tracks, list_tracks_files
+from manifest import get_manifest, DOWNLOADED, TAGGED, FAILED
+from tagging import write_mp3_tags
 
 # Ensure stdout/stderr handles UTF-8
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
@@ -41,6 +42,10 @@ def download_mp3(song, album=None):
     coverUrl = song.get("coverUrl", "")
     
     print(f"✅ Starting download: {title} | Artist: {artist} | VideoID: {video_id}")
+    # Manifest rows are keyed by the videoId from the tracks file
+    song_id = video_id
+    manifest = get_manifest()
+    manifest.begin(song_id)
 
     # yt-dlp options
     ydl_opts = {
@@ -53,8 +58,9 @@ def download_mp3(song, album=None):
     }
 
     try:
+        from yt_dlp import YoutubeDL
         with YoutubeDL(ydl_opts) as ydl:
-            songdata = ydl.extract_info(url, download=True)
+            songdata = get_limiter("youtube").call(ydl.extract_info, url, download=True)
 
         print("\n========= Extract video info cleanly =========")
         wanted_keys = ["id", "title", "author", "album", "thumbnail", "description",
@@ -107,38 +113,24 @@ def download_mp3(song, album=None):
             os.rename(temp_filepath, final_filepath)
         else:
             print(f"[ERROR] Expected file not found: {temp_filepath}")
+            manifest.mark(song_id, FAILED, error="expected file not found")
             return
+        manifest.mark(song_id, DOWNLOADED, path=final_filepath)
 
-        # ID3 tagging
-        try:
-            audio = EasyID3(final_filepath)
-        except ID3NoHeaderError:
-            ID3().save(final_filepath)
-            audio = EasyID3(final_filepath)
-
-        audio["title"] = title
-        audio["artist"] = artist
-        if tags:
-            audio["composer"] = ", ".join(tags) if isinstance(tags, list) else str(tags)
-        audio.save(v2_version=3)
-
-        # Add videoId and release date using ID3
-        id3 = ID3(final_filepath)
-        if video_id:
-            id3.add(TKEY(encoding=3, text=video_id))
-        if publishdate:
-            date_only = publishdate.split("T")[0].replace("-", "")
-            id3.add(COMM(encoding=3, lang='eng', desc='ReleasedDate', text=date_only))
-        id3.save(v2_version=3)
+        # ID3 tagging, written in one pass
+        write_mp3_tags(final_filepath, title, artist, tags=tags,
+                       video_id=video_id, publishDate=publishdate)
 
+        manifest.mark(song_id, TAGGED, path=final_filepath)
         print(f"✅ Downloaded & tagged: {final_filepath}\n")
 
     except Exception as e:
         print(f"[ERROR] Failed to download '{title}' from {url}: {e}")
+        manifest.mark(song_id, FAILED, error=str(e))
 
 
 def main():
-    json_files = [f for f in os.listdir(DATA_FOLDER) if f.endswith(".json")]
+    json_files = list_tracks_files(DATA_FOLDER)
     if not json_files:
         print("[INFO] No JSON files found in data/ folder.")
         return
@@ -146,15 +138,24 @@ def main():
     for json_file in json_files:
         filepath = os.path.join(DATA_FOLDER, json_file)
         album_name = os.path.splitext(json_file)[0]
+        # Records are read one at a time (JSON lines or a legacy JSON array)
+        songs = iter_tracks(filepath)
+
+        # Skip tracks the manifest already has on disk, so reruns only do new work
+        manifest = get_manifest()
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                songs = json.load(f)
+            for song in songs:
+                if not manifest.needs_download(song.get("videoId")):
+                    print(f"[SKIP] {song.get('title')} already done")
+                    continue
+                download_mp3(song, album=album_name)
         except Exception as e:
             print(f"[ERROR] Could not read {filepath}: {e}")
             continue
 
-        for song in songs:
-            download_mp3(song, album=album_name)
+    print(f"[INFO] Manifest: {get_manifest().summary()}")
+    print_stats()
+    print_rate_stats()
 
 
 if __name__ == "__main__":
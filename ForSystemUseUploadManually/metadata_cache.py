@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.getenv("METADATA_CACHE", os.path.join(".cache", "metadata.sqlite3"))
+# Maximum number of videoIds kept before the least recently used are evicted
+MAX_ENTRIES = int(os.getenv("METADATA_CACHE_SIZE", "5000"))
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# get_song sections we keep, with how long each one stays fresh (seconds)
+FIELD_TTL = {
+    "videoDetails": 7 * DAY,        # title, author, viewCount
+    "microformat": 30 * DAY,        # publishDate, thumbnails, tags, description
+    "playabilityStatus": DAY,
+    "streamingData": 5 * HOUR,      # signed stream URLs expire after ~6h
+}
+DEFAULT_FIELDS = ("videoDetails", "microformat")
+
+
+class MetadataCache:
+    """On-disk get_song cache keyed by videoId, with per-field TTL and LRU eviction."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, field_ttl=FIELD_TTL):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.field_ttl = field_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fields ("
+            " video_id TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL, PRIMARY KEY (video_id, field))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS songs (video_id TEXT PRIMARY KEY, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS songs_accessed ON songs (accessed_at)")
+        self._conn.commit()
+
+    def get(self, video_id, fields=DEFAULT_FIELDS):
+        """Return the cached fields for video_id, or None unless all of them are fresh."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT field, value, fetched_at FROM fields WHERE video_id = ?", (video_id,)
+            ).fetchall()
+            fresh = {
+                field: value for field, value, fetched_at in rows
+                if field in fields and now - fetched_at < self.field_ttl.get(field, 0)
+            }
+            if len(fresh) < len(fields):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE songs SET accessed_at = ? WHERE video_id = ?", (now, video_id)
+            )
+            self._conn.commit()
+        return {field: json.loads(value) for field, value in fresh.items()}
+
+    def put(self, video_id, metadata):
+        """Store the known sections of a get_song response."""
+        now = time.time()
+        rows = [
+            (video_id, field, json.dumps(metadata[field], ensure_ascii=False), now)
+            for field in self.field_ttl if metadata.get(field) is not None
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fields (video_id, field, value, fetched_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO songs (video_id, accessed_at) VALUES (?, ?)", (video_id, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM songs").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        stale = self._conn.execute(
+            "SELECT video_id FROM songs ORDER BY accessed_at LIMIT ?", (excess,)
+        ).fetchall()
+        self._conn.executemany("DELETE FROM fields WHERE video_id = ?", stale)
+        self._conn.executemany("DELETE FROM songs WHERE video_id = ?", stale)
+        self.evictions += len(stale)
+
+    def stats(self):
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM songs").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetadataCache()
+        return _cache
+
+
+def cached_get_song(ytmusic, video_id, fields=DEFAULT_FIELDS):
+    """Read-through wrapper around ytmusic.get_song."""
+    cache = get_cache()
+    metadata = cache.get(video_id, fields)
+    if metadata is None:
+        metadata = ytmusic.get_song(video_id)
+        cache.put(video_id, metadata)
+    return metadata
+
+
+def print_stats(file=None):
+    if _cache is None:
+        return
+    s = _cache.stats()
+    total = s["hits"] + s["misses"]
+    ratio = (s["hits"] / total * 100) if total else 0
+    print(f"[INFO] Metadata cache: {s['hits']} hits, {s['misses']} misses ({ratio:.0f}% hit rate), "
+          f"{s['evictions']} evicted, {s['entries']} entries", file=file)
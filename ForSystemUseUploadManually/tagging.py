@@ -0,0 +1,142 @@
+import base64
+import io
+
+# mutagen is imported inside each writer, so only the container in use is loaded
+
+# Spare room left in the ID3 header so later tag edits are rewritten in place
+ID3_PADDING = 4096
+
+
+def release_date(publishDate):
+    """'2025-05-01T00:00:00-07:00' -> '20250501'"""
+    return publishDate.split("T")[0].replace("-", "") if publishDate else None
+
+
+def join_tags(tags):
+    if not tags:
+        return None
+    return ", ".join(tags) if isinstance(tags, list) else str(tags)
+
+
+def id3_padding(info):
+    """Reuse the existing padding when the new tag fits, else reserve ID3_PADDING."""
+    return info.padding if info.padding >= 0 else ID3_PADDING
+
+
+def add_mp3_frames(id3, title, artist, tags=None, video_id=None, publishDate=None,
+                   recording_date=None, cover=None):
+    """Set every frame write_mp3_tags stores on an ID3 object."""
+    from mutagen.id3 import TIT2, TPE1, TCOM, TDRC, TKEY, COMM, APIC
+
+    if title:
+        id3.setall("TIT2", [TIT2(encoding=3, text=title)])
+    if artist:
+        id3.setall("TPE1", [TPE1(encoding=3, text=artist)])
+    composer = join_tags(tags)
+    if composer:
+        id3.setall("TCOM", [TCOM(encoding=3, text=composer)])
+    if recording_date:
+        id3.setall("TDRC", [TDRC(encoding=3, text=release_date(recording_date))])
+    # Add videoId and release date
+    if video_id:
+        id3.add(TKEY(encoding=3, text=video_id))
+    date_only = release_date(publishDate)
+    if date_only:
+        id3.add(COMM(encoding=3, lang='eng', desc='ReleasedDate', text=date_only))
+    if cover:
+        data, mime = cover
+        id3.setall("APIC", [APIC(encoding=3, mime=mime, type=3, desc="Cover", data=data)])
+
+
+def write_mp3_tags(path, title, artist, tags=None, video_id=None, publishDate=None,
+                   recording_date=None, cover=None):
+    """Build every frame in memory and write the ID3v2.3 tag with a single save.
+
+    publishDate goes into the 'ReleasedDate' comment; recording_date, if given,
+    goes into TDRC (the EasyID3 'date' key). cover is (image bytes, mime type)
+    and becomes the front-cover APIC frame.
+    """
+    from mutagen.id3 import ID3, ID3NoHeaderError
+
+    try:
+        id3 = ID3(path)
+    except ID3NoHeaderError:
+        id3 = ID3()
+    add_mp3_frames(id3, title, artist, tags=tags, video_id=video_id, publishDate=publishDate,
+                   recording_date=recording_date, cover=cover)
+    id3.save(path, v2_version=3, padding=id3_padding)
+
+
+def mp3_tag_bytes(title, artist, tags=None, video_id=None, publishDate=None, cover=None):
+    """The ID3v2.3 tag write_mp3_tags would store, rendered to bytes.
+
+    Written in front of the encoder's output it tags the file without a second pass.
+    """
+    from mutagen.id3 import ID3
+
+    id3 = ID3()
+    add_mp3_frames(id3, title, artist, tags=tags, video_id=video_id, publishDate=publishDate, cover=cover)
+    buf = io.BytesIO()
+    id3.save(buf, v2_version=3, padding=lambda info: ID3_PADDING)
+    return buf.getvalue()
+
+
+def write_m4a_tags(path, title, artist, tags=None, video_id=None, publishDate=None, cover=None):
+    from mutagen.mp4 import MP4, MP4Cover, MP4FreeForm
+
+    audio = MP4(path)
+    if audio.tags is None:
+        audio.add_tags()
+    audio["\xa9nam"] = [title]
+    audio["\xa9ART"] = [artist]
+    composer = join_tags(tags)
+    if composer:
+        audio["\xa9wrt"] = [composer]
+    # iTunes-style freeform atoms stand in for the ID3 TKEY/COMM frames
+    if video_id:
+        audio["----:com.apple.iTunes:videoId"] = [MP4FreeForm(video_id.encode("utf-8"))]
+    date_only = release_date(publishDate)
+    if date_only:
+        audio["----:com.apple.iTunes:ReleasedDate"] = [MP4FreeForm(date_only.encode("utf-8"))]
+    if cover:
+        data, mime = cover
+        imageformat = MP4Cover.FORMAT_PNG if mime == "image/png" else MP4Cover.FORMAT_JPEG
+        audio["covr"] = [MP4Cover(data, imageformat=imageformat)]
+    audio.save()
+
+
+def write_opus_tags(path, title, artist, tags=None, video_id=None, publishDate=None, cover=None):
+    from mutagen.flac import Picture
+    from mutagen.oggopus import OggOpus
+
+    audio = OggOpus(path)
+    audio["title"] = [title]
+    audio["artist"] = [artist]
+    composer = join_tags(tags)
+    if composer:
+        audio["composer"] = [composer]
+    if video_id:
+        audio["videoid"] = [video_id]
+    date_only = release_date(publishDate)
+    if date_only:
+        audio["releaseddate"] = [date_only]
+    if cover:
+        picture = Picture()
+        picture.data, picture.mime = cover
+        picture.type = 3
+        picture.desc = "Cover"
+        audio["metadata_block_picture"] = [base64.b64encode(picture.write()).decode("ascii")]
+    audio.save()
+
+
+TAG_WRITERS = {
+    "mp3": write_mp3_tags,
+    "m4a": write_m4a_tags,
+    "opus": write_opus_tags,
+}
+
+
+def write_tags(path, audio_format, title, artist, tags=None, video_id=None, publishDate=None, cover=None):
+    """Tag a downloaded file with the writer that matches its container."""
+    TAG_WRITERS[audio_format](path, title, artist, tags=tags, video_id=video_id, publishDate=publishDate,
+                              cover=cover)
@@ -0,0 +1,101 @@
+import json
+import os
+
+# Bytes read at a time when streaming an old-style JSON array file
+CHUNK_SIZE = 64 * 1024
+TRACKS_EXTENSIONS = (".jsonl", ".json")
+
+
+class TracksWriter:
+    """Writes one JSON record per line and flushes it, so readers can start early
+    and a crash loses at most the track being written."""
+
+    def __init__(self, path, mode="w"):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.count = 0
+        self._f = open(path, mode, encoding="utf-8")
+
+    def write(self, record):
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self.count += 1
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def iter_tracks(path):
+    """Yield track records from a JSON-lines file or a legacy JSON array file,
+    one at a time, without loading the whole file."""
+    with open(path, "r", encoding="utf-8") as f:
+        first = ""
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                first = ch
+                break
+        if first == "[":
+            yield from _iter_json_array(f)
+            return
+
+        line = first + f.readline()
+        while line:
+            next_line = f.readline()
+            line = line.strip()
+            if line:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    if next_line:
+                        raise
+                    # A writer that died mid-record leaves a cut-off last line
+                    print(f"[WARN] Skipping incomplete last record in {path}: {e}")
+                    return
+                yield record
+            line = next_line
+
+
+def _iter_json_array(f):
+    decoder = json.JSONDecoder()
+    buf = ""
+    eof = False
+    while True:
+        buf = buf.lstrip().lstrip(",").lstrip()
+        if buf.startswith("]"):
+            return
+        try:
+            record, end = decoder.raw_decode(buf)
+        except json.JSONDecodeError:
+            if eof:
+                if buf:
+                    raise
+                return
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buf += chunk
+            continue
+        yield record
+        buf = buf[end:]
+
+
+def resolve_tracks_file(path):
+    """Prefer the .jsonl file, falling back to an older .json one with the same name."""
+    if os.path.exists(path):
+        return path
+    base, ext = os.path.splitext(path)
+    for other in TRACKS_EXTENSIONS:
+        if other != ext and os.path.exists(base + other):
+            return base + other
+    return path
+
+
+def list_tracks_files(folder):
+    return sorted(f for f in os.listdir(folder) if f.endswith(TRACKS_EXTENSIONS))
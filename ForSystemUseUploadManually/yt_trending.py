@@ -1,6 +1,7 @@
-import json
-import os
-from ytmusicapi import YTMusic
+from metadata_cache import cached_get_song, print_stats
+from manifest import get_manifest
+from tracks_io import TracksWriter
+from rate_limiter import RateLimited, print_stats as print_rate_stats
 import sys
 import io
 from datetime import datetime
@@ -10,7 +11,8 @@ sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 def fetch_playlist_full_metadata(playlist_id):
-    ytmusic = YTMusic()
+    from ytmusicapi import YTMusic
+    ytmusic = RateLimited(YTMusic(), "ytmusic")
     
     try:
         playlist = ytmusic.get_playlist(playlist_id, limit=100)
@@ -18,7 +20,11 @@ def fetch_playlist_full_metadata(playlist_id):
         print("[ERROR] Failed to fetch playlist:", e, file=sys.stderr)
         return
 
-    all_songs_data = []
+    # Songs are appended to a JSON-lines file as they arrive instead of being
+    # collected and dumped at the end
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"data/playlist_full_{timestamp}.jsonl"
+    writer = TracksWriter(filename)
 
     for idx, track in enumerate(playlist["tracks"], start=1):
         
@@ -30,10 +36,11 @@ def fetch_playlist_full_metadata(playlist_id):
 
         try:
             # Fetch full metadata for each song
-            metadata = ytmusic.get_song(videoId)
+            metadata = cached_get_song(ytmusic, videoId)
         except Exception as e:
             print(f"[ERROR] Failed to fetch metadata for {videoId}: {e}", file=sys.stderr)
             continue
+        get_manifest().mark_fetched(videoId)
 
         thumbnails = metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("thumbnail", {}).get("thumbnails", [])
         coverUrl = thumbnails[0]["url"] if thumbnails else None
@@ -71,18 +78,13 @@ def fetch_playlist_full_metadata(playlist_id):
            # }
         }
 
-        all_songs_data.append(song_data)
+        writer.write(song_data)
         print(f"[{idx}] {song_data['title']} - {song_data['urlCanonical']}", file=sys.stderr)
 
-    # Save all songs in JSON
-    os.makedirs("data", exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"data/playlist_full_{timestamp}.json"
-
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(all_songs_data, f, ensure_ascii=False, indent=2)
-
+    writer.close()
     print(f"[INFO] Saved full playlist metadata to {filename}", file=sys.stderr)
+    print_stats(file=sys.stderr)
+    print_rate_stats(file=sys.stderr)
 
 if __name__ == "__main__":
     playlist_id = "PL4fGSI1pDJn40WjZ6utkIuj2rNg-7iGsq"
@@ -1,19 +1,35 @@
 import json
 import os
-from ytmusicapi import YTMusic
+import threading
+from metadata_cache import cached_get_song
+from rate_limiter import RateLimited
+
+_ytmusic = None
+_ytmusic_lock = threading.Lock()
+
 
 def get_ytmusic_client():
+    # ytmusicapi and headers_auth.json are only loaded once a song is looked up
+    from ytmusicapi import YTMusic
     if os.path.exists("headers_auth.json"):
         return YTMusic("headers_auth.json")
     else:
         print("⚠️ Using anonymous YTMusic client (limited)")
         return YTMusic()
 
-ytmusic = get_ytmusic_client()
+
+def get_ytmusic():
+    """Return the shared client, building it on first use; its calls go through the "ytmusic" rate limiter."""
+    global _ytmusic
+    with _ytmusic_lock:
+        if _ytmusic is None:
+            _ytmusic = RateLimited(get_ytmusic_client(), "ytmusic")
+        return _ytmusic
+
 
 def get_song_by_id(video_id: str) -> dict | None:
     try:
-        metadata = ytmusic.get_song(video_id)
+        metadata = cached_get_song(get_ytmusic(), video_id)
         thumbnails = metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("thumbnail", {}).get("thumbnails", [])
         coverUrl = thumbnails[0]["url"] if thumbnails else None
         pub_date_str = metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("publishDate")
@@ -1,10 +1,9 @@
 import os
 import json
 from yt_dlp import YoutubeDL
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import ID3, ID3NoHeaderError, TKEY,TDRC,COMM
 import sys
 import io
+from tagging import write_mp3_tags
 
 # Ensure stdout/stderr handles UTF-8
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
@@ -87,36 +86,9 @@ def download_mp3(song, album=None):
             print(f"[ERROR] Expected file not found: {temp_filepath}")
             return
 
-        # --- ID3 Tagging ---
-        try:
-            audio = EasyID3(final_filepath)
-        except ID3NoHeaderError:
-            ID3().save(final_filepath)
-            audio = EasyID3(final_filepath)
-
-        audio["title"] = title
-        audio["artist"] = artist
-
-        if tags:
-            audio["composer"] = ", ".join(tags) if isinstance(tags, list) else str(tags)
-        
-        audio.save(v2_version=3)
-
-        # Add videoId as TKEY
-        if video_id:
-            id3 = ID3(final_filepath)
-            id3.add(TKEY(encoding=3, text=video_id))
-            id3.save(v2_version=3)
-
-        if publishdate:
-            id3 = ID3(final_filepath)
-            date_only = publishdate.split("T")[0]  # "2025-05-01"
-            date_no_dash = date_only.replace("-", "")  # "20250501"
-            id3.add(COMM(encoding=3, lang='eng', desc='ReleasedDate', text=date_no_dash))
-            
-            #id3.add(TDRC(encoding=3, text=date_no_dash))
-            id3.save(v2_version=3)
-
+        # --- ID3 Tagging (single write) ---
+        write_mp3_tags(final_filepath, title, artist, tags=tags,
+                       video_id=video_id, publishDate=publishdate)
 
         print(f"✅ Downloaded & tagged: {final_filepath}")
 
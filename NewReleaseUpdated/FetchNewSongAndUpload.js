@@ -1,49 +1,29 @@
 import path from "path";
-import { spawn } from "child_process";
 import uploadAllSongs from "./SongUploadingAutomation.js";
+import { PythonWorker } from "../PythonWorker.js";
 import { fileURLToPath } from "url";
 
 // ✅ Resolve __dirname in ESM
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
-// ✅ Helper to run Python script
-function runPython(script) {
-  return new Promise((resolve, reject) => {
-    const pythonProcess = spawn("python", [script]);
-
-    pythonProcess.stdout.on("data", (data) => {
-      console.log(`[PYTHON STDOUT] ${data.toString()}`);
-    });
-
-    pythonProcess.stderr.on("data", (data) => {
-      console.error(`[PYTHON STDERR] ${data.toString()}`);
-    });
-
-    pythonProcess.on("error", (err) => {
-      reject(err);
-    });
-
-    pythonProcess.on("close", (code) => {
-      if (code === 0) {
-        resolve();
-      } else {
-        reject(new Error(`Python script exited with code ${code}`));
-      }
-    });
-  });
-}
-
 // ✅ Main pipeline
 export async function fetchAndUpload() {
   try {
     console.log(`[INFO] 🚀 Starting Fetch + Upload pipeline`);
 
-    // Step 1: Run Python script 1
-    await runPython(path.join(__dirname, "./NewReleaseUpdated/yt_NewReleased.py"));
-
-    // Step 2: Run Python script 2
-    await runPython(path.join(__dirname, "./NewReleaseUpdated/download_song.py"));
+    // Both steps run this folder's scripts as jobs on one long-lived Python worker
+    const worker = new PythonWorker(path.join(__dirname, "worker.py"));
+    try {
+      // Step 1: Fetch metadata for the new releases chart (yt_NewReleased.py)
+      await worker.call("fetch_playlist");
+
+      // Step 2: Download and tag every pending song under data/ (download_song.py)
+      const result = await worker.call("download");
+      console.log(`[INFO] Download job: ${result.ok} ok, ${result.skipped} skipped, ${result.failed} failed`);
+    } finally {
+      await worker.close();
+    }
 
     // Step 3: Upload songs into DB
     //await uploadAllSongs();
@@ -1,19 +1,35 @@
 import os
-import json
-from yt_dlp import YoutubeDL
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import ID3, ID3NoHeaderError
 import re
+from tracks_io import iter_tracks, list_tracks_files
+from track import Track
+from manifest import get_manifest, DOWNLOADED, TAGGED, FAILED
+from ydl_engine import EnginePool
+from rate_limiter import get_limiter, print_stats as print_rate_stats
+from tagging import write_mp3_tags
 
 import sys
-import io
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+# reconfigure is safe when imported by worker.py
+sys.stdout.reconfigure(encoding='utf-8')
+sys.stderr.reconfigure(encoding='utf-8')
 DATA_FOLDER = "data"
 DOWNLOAD_FOLDER = "Download_Songs"
 
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
+# yt-dlp options shared by every track; the output path is set per download
+YDL_OPTS = {
+    "format": "bestaudio/best",
+    "postprocessors": [{
+        "key": "FFmpegExtractAudio",
+        "preferredcodec": "mp3",
+        "preferredquality": "192",
+    }],
+    "quiet": False,
+    "no_warnings": True,
+}
+# One long-lived YoutubeDL for the whole run
+engines = EnginePool(YDL_OPTS)
+
 
 def clean_title(title):
     if not title:
@@ -30,21 +46,16 @@ def sanitize_filename(name):
 
 def download_mp3(song, album=None):
     # Resolve URL (prefer urlCanonical, fallback to videoId)
-    url = song.get("urlCanonical")
-    if not url:
-        video_id = song.get("videoId")
-        if video_id:
-            url = f"https://music.youtube.com/watch?v={video_id}"
-        else:
-            print(f"[SKIP] No valid URL for: {song.get('title', 'Unknown')}")
-            return
+    if not song.urlCanonical and not song.videoId:
+        print(f"[SKIP] No valid URL for: {song.title or 'Unknown'}")
+        return
+    url = song.url
 
-    # Fallback metadata from JSON
-    fallback_title = song.get("title", "Unknown Title")
-    fallback_title = clean_title(fallback_title)
-    fallback_artist = song.get("artist", "Unknown Artist")
-    tags = song.get("tags") or []
-    publishdate = song.get("publishDate") 
+    # Fallback metadata from the tracks file
+    fallback_title = clean_title(song.title)
+    fallback_artist = song.artist or "Unknown Artist"
+    tags = list(song.tags)
+    publishdate = song.publishDate
 
     # Build safe target path (we will instruct yt_dlp to create final mp3 at this exact path)
     safe_title = sanitize_filename(fallback_title)
@@ -52,27 +63,19 @@ def download_mp3(song, album=None):
     filename = f"{safe_title} - {safe_artist}.mp3"
     filepath = os.path.join(DOWNLOAD_FOLDER, filename)
 
+    video_id = song.videoId
+    manifest = get_manifest()
     if os.path.exists(filepath):
         print(f"[SKIP] {filename} already exists")
+        manifest.mark(video_id, TAGGED, path=filepath)
         return
 
-    ydl_opts = {
-        "format": "bestaudio/best",
-        # create a temporary file with the same name but proper extension replacement
-        "outtmpl": filepath.replace(".mp3", ".%(ext)s"),
-        "postprocessors": [{
-            "key": "FFmpegExtractAudio",
-            "preferredcodec": "mp3",
-            "preferredquality": "192",
-        }],
-        "quiet": False,
-        "no_warnings": True,
-    }
-
+    manifest.begin(video_id)
     try:
-        with YoutubeDL(ydl_opts) as ydl:
-            # extract_info returns metadata dict and will download
-            info = ydl.extract_info(url, download=True)
+        # extract_info returns metadata dict and will download; the template is
+        # the final name with the extension swapped so the mp3 lands at filepath
+        info = get_limiter("youtube").call(engines.get().download, url, filepath.replace(".mp3", ".%(ext)s"))
+        manifest.mark(video_id, DOWNLOADED, path=filepath)
 
         # Use yt_dlp metadata if available (prefer this)
         title = info.get("title") or fallback_title
@@ -83,75 +86,63 @@ def download_mp3(song, album=None):
         # mp3_path is where our mp3 should be (outtmpl ensures this)
         mp3_path = filepath
 
-        # Ensure ID3 header exists: open EasyID3, create header if missing
+        # Write title/artist/composer/date in one pass
         try:
-            audio = EasyID3(mp3_path)
-        except ID3NoHeaderError:
-            # create empty ID3 header then re-open
-            ID3().save(mp3_path)
-            audio = EasyID3(mp3_path)
-        except Exception as e:
-            # unexpected exception when opening tags
-            print(f"[WARN] Could not open ID3 tags initially: {e}. Attempting to create header.")
-            try:
-                ID3().save(mp3_path)
-                audio = EasyID3(mp3_path)
-            except Exception as ee:
-                print(f"[ERROR] Failed to create ID3 header: {ee}")
-                return
-
-        # Assign tags (EasyID3 accepts string or list of strings)
-        try:
-
-            if title:
-                audio["title"] = safe_title
-            if fallback_artist:
-                audio["artist"] = fallback_artist
-            #if album:
-               # audio["album"] = album
-            # composer stores tags/genres — store as single string
-            if ytd_tags:
-                if isinstance(ytd_tags, list):
-                    audio["composer"] = ", ".join(ytd_tags)
-                else:
-                    audio["composer"] = str(ytd_tags)
-            # publish date (use 'date' key)
-            # publish date (use 'date' key)
-            if publishdate:
-                date_only = publishdate.split("T")[0]  # "2025-05-01"
-                date_no_dash = date_only.replace("-", "")  # "20250501"
-                audio["date"] = date_no_dash
-
-
-            audio.save(v2_version=3)  # save as ID3v2.3 for broad compatibility
+            # composer stores tags/genres; the publish date goes into 'date' (TDRC)
+            write_mp3_tags(mp3_path, safe_title if title else None, fallback_artist,
+                           tags=ytd_tags, recording_date=publishdate)
         except Exception as e:
             print(f"[ERROR] Failed to write ID3 tags for {mp3_path}: {e}")
+            manifest.mark(video_id, FAILED, error=str(e))
             return
 
+        manifest.mark(video_id, TAGGED, path=mp3_path)
         print(f"✅ Downloaded & tagged: {filename} | Title: {title} | Artist: {artist}")
 
     except Exception as e:
         print(f"[ERROR] Failed to download '{fallback_title}' from {url}: {e}")
+        manifest.mark(video_id, FAILED, error=str(e))
+
+
+def download_file(filepath, on_song=None):
+    """Download every song in one tracks file that isn't done yet.
+
+    on_song(song, record) is called after each song with its manifest record,
+    or with None when the song was skipped.
+    """
+    album_name = os.path.splitext(os.path.basename(filepath))[0]  # use filename as album/playlist name
+    # Records are read one at a time (JSON lines or a legacy JSON array)
+    songs = iter_tracks(filepath)
+
+    # Skip tracks the manifest already has on disk, so reruns only do new work
+    manifest = get_manifest()
+    try:
+        for record in songs:
+            song = Track.from_dict(record)
+            if not manifest.needs_download(song.videoId):
+                print(f"[SKIP] {song.title} already done")
+                if on_song:
+                    on_song(song, None)
+                continue
+            download_mp3(song, album=album_name)
+            if on_song:
+                on_song(song, manifest.get(song.videoId))
+    except Exception as e:
+        print(f"[ERROR] Could not read {filepath}: {e}")
 
 
 def main():
-    json_files = [f for f in os.listdir(DATA_FOLDER) if f.endswith(".json")]
+    json_files = list_tracks_files(DATA_FOLDER)
     if not json_files:
         print("[INFO] No JSON files found in data/ folder.")
         return
 
     for json_file in json_files:
-        filepath = os.path.join(DATA_FOLDER, json_file)
-        album_name = os.path.splitext(json_file)[0]  # use filename as album/playlist name
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                songs = json.load(f)
-        except Exception as e:
-            print(f"[ERROR] Could not read {filepath}: {e}")
-            continue
+        download_file(os.path.join(DATA_FOLDER, json_file))
 
-        for song in songs:
-            download_mp3(song, album=album_name)
+    engines.close_all()
+    print(f"[INFO] Manifest: {get_manifest().summary()}")
+    print_rate_stats()
 
 
 if __name__ == "__main__":
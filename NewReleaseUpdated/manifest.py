@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import threading
+import time
+
+MANIFEST_PATH = os.getenv("DOWNLOAD_MANIFEST", os.path.join(".cache", "manifest.sqlite3"))
+# Failed tracks are retried on later runs until they reach this many attempts
+MAX_ATTEMPTS = int(os.getenv("MAX_ATTEMPTS", "3"))
+
+FETCHED = "fetched"
+DOWNLOADED = "downloaded"
+TAGGED = "tagged"
+FAILED = "failed"
+
+
+class Manifest:
+    """Durable per-videoId record of how far each track got through the pipeline."""
+
+    def __init__(self, path=MANIFEST_PATH, max_attempts=MAX_ATTEMPTS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracks ("
+            " video_id TEXT PRIMARY KEY, state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " path TEXT, error TEXT, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, video_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, attempts, path, error FROM tracks WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"state": row[0], "attempts": row[1], "path": row[2], "error": row[3]}
+
+    def needs_download(self, video_id):
+        """True unless the track is already tagged on disk or has used up its attempts."""
+        if not video_id:
+            return True
+        record = self.get(video_id)
+        if record is None:
+            return True
+        if record["state"] == TAGGED:
+            return not (record["path"] and os.path.exists(record["path"]))
+        if record["state"] == FAILED:
+            return record["attempts"] < self.max_attempts
+        return True
+
+    def mark_fetched(self, video_id):
+        """Record that metadata exists for video_id without touching later states."""
+        if not video_id:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO tracks (video_id, state, updated_at) VALUES (?, ?, ?)",
+                (video_id, FETCHED, time.time()),
+            )
+            self._conn.commit()
+
+    def begin(self, video_id):
+        """Count a new download attempt before any work starts."""
+        if not video_id:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tracks (video_id, state, attempts, updated_at) VALUES (?, ?, 1, ?)"
+                " ON CONFLICT(video_id) DO UPDATE SET attempts = attempts + 1, updated_at = excluded.updated_at",
+                (video_id, FETCHED, time.time()),
+            )
+            self._conn.commit()
+
+    def mark(self, video_id, state, path=None, error=None):
+        if not video_id:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tracks (video_id, state, path, error, updated_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(video_id) DO UPDATE SET state = excluded.state,"
+                " path = COALESCE(excluded.path, path), error = excluded.error, updated_at = excluded.updated_at",
+                (video_id, state, path, error, time.time()),
+            )
+            self._conn.commit()
+
+    def summary(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM tracks GROUP BY state").fetchall()
+        return dict(rows)
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_manifest():
+    """Return the process-wide manifest, opening it on first use."""
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            _manifest = Manifest()
+        return _manifest
@@ -0,0 +1,134 @@
+import os
+import random
+import re
+import threading
+import time
+
+# Starting rate (requests/sec) and burst per endpoint. The rate then adapts:
+# +RATE_STEP/sec after each success, x RATE_DECREASE after a 429/403 (AIMD)
+ENDPOINTS = {
+    "ytmusic": {"rate": float(os.getenv("YTMUSIC_RATE", "5")), "burst": int(os.getenv("YTMUSIC_BURST", "8"))},
+    "youtube": {"rate": float(os.getenv("DOWNLOAD_RATE", "2")), "burst": int(os.getenv("DOWNLOAD_BURST", "4"))},
+}
+MIN_RATE = 0.1
+MAX_RATE_FACTOR = 4  # never climb past this multiple of the configured rate
+RATE_STEP = 0.1
+RATE_DECREASE = 0.5
+# Pause for the whole endpoint after a throttle response, doubled per repeat
+THROTTLE_COOLDOWN = float(os.getenv("THROTTLE_COOLDOWN", "5"))
+THROTTLE_RETRIES = int(os.getenv("THROTTLE_RETRIES", "3"))
+
+# Only a real status line counts: a bare "403" also turns up in video IDs, URLs and byte counts
+THROTTLE_PATTERN = re.compile(
+    r"HTTP(?: Error)? (?:403|429)\b|\b(?:429|403) (?:Too Many Requests|Forbidden)\b|Too Many Requests|\brate[- ]limit")
+
+
+def is_throttled(error):
+    """True if an exception from ytmusicapi or yt-dlp looks like a 429/403 response."""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status in (403, 429):
+        return True
+    return THROTTLE_PATTERN.search(str(error)) is not None
+
+
+class TokenBucket:
+    """Token bucket for one endpoint whose refill rate adapts AIMD-style."""
+
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = rate
+        self.max_rate = rate * MAX_RATE_FACTOR
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.throttles = 0
+        self._streak = 0
+        self._paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self._streak = 0
+            self.rate = min(self.max_rate, self.rate + RATE_STEP)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttles += 1
+            self._streak += 1
+            self.rate = max(MIN_RATE, self.rate * RATE_DECREASE)
+            self.tokens = 0.0
+            cooldown = THROTTLE_COOLDOWN * 2 ** (self._streak - 1) * random.uniform(0.8, 1.2)
+            self._paused_until = max(self._paused_until, time.monotonic() + cooldown)
+        print(f"[WARN] {self.name} throttled; backing off {cooldown:.1f}s, rate now {self.rate:.2f}/s")
+
+    def call(self, func, *args, on_retry=None, **kwargs):
+        """Run func under this bucket, retrying throttled calls after backing off.
+
+        on_retry, if given, is called with no arguments before each retry.
+        """
+        for attempt in range(THROTTLE_RETRIES + 1):
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_throttled(e) or attempt == THROTTLE_RETRIES:
+                    raise
+                self.on_throttle()
+                if on_retry:
+                    on_retry()
+                continue
+            self.on_success()
+            return result
+
+
+class RateLimited:
+    """Proxy whose method calls all go through one endpoint's bucket."""
+
+    def __init__(self, target, endpoint):
+        self._target = target
+        self._bucket = get_limiter(endpoint)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def limited(*args, **kwargs):
+            return self._bucket.call(attr, *args, **kwargs)
+        return limited
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(endpoint):
+    """Return the process-wide bucket for endpoint, shared by every thread."""
+    with _limiters_lock:
+        bucket = _limiters.get(endpoint)
+        if bucket is None:
+            settings = ENDPOINTS[endpoint]
+            bucket = _limiters[endpoint] = TokenBucket(endpoint, settings["rate"], settings["burst"])
+        return bucket
+
+
+def print_stats(file=None):
+    for bucket in _limiters.values():
+        print(f"[INFO] Rate limit {bucket.name}: {bucket.rate:.2f}/s, {bucket.throttles} throttled",
+              file=file)
@@ -0,0 +1,107 @@
+"""Long-running worker FetchNewSongAndUpload.js sends jobs to instead of running each script in a new python.
+
+Runs this folder's own yt_NewReleased.py and download_song.py, so new
+releases keep their cleaned titles and TDRC dates. Speaks newline-delimited
+JSON-RPC 2.0 over stdin/stdout (see rpc.py). The YTMusic client, the
+YoutubeDL engine and the metadata cache stay open between jobs.
+
+Methods:
+    ping                              -> {"pid", "uptime", "jobs"}
+    fetch_playlist {playlistId, limit} -> {"tracksFile", "videoIds"}
+    download       {tracksFile}        -> {"ok", "failed", "skipped", "results"}
+    shutdown                          -> {"jobs"}
+"""
+import os
+import sys
+
+from yt_NewReleased import fetch_playlist_full_metadata, get_ytmusic, TRACK_LIMIT
+from download_song import DATA_FOLDER, download_file, engines
+from manifest import get_manifest, TAGGED
+from metadata_cache import print_stats
+from rate_limiter import print_stats as print_rate_stats
+from tracks_io import list_tracks_files
+from rpc import RpcWorker, InvalidParams, run
+
+# The new releases chart yt_NewReleased.py fetches when run on its own
+PLAYLIST_ID = "RDATdX"
+
+
+class Worker(RpcWorker):
+    def __init__(self, out):
+        super().__init__(out)
+        self.methods.update({
+            "fetch_playlist": self.fetch_playlist,
+            "download": self.download,
+        })
+
+    def close(self):
+        engines.close_all()
+
+    def fetch_playlist(self, params, emit):
+        """Fetch metadata for the new releases chart into a new data/playlist_full_*.jsonl."""
+        playlist_id = params.get("playlistId", PLAYLIST_ID)
+        if not isinstance(playlist_id, str):
+            raise InvalidParams("playlistId must be a string")
+        videoIds = []
+
+        def on_track(track):
+            videoIds.append(track.videoId)
+            emit("fetched", track.videoId, title=track.title, artist=track.artist)
+
+        tracks_file = fetch_playlist_full_metadata(playlist_id, params.get("limit", TRACK_LIMIT), on_track=on_track)
+        if tracks_file is None:
+            raise RuntimeError(f"Failed to fetch playlist {playlist_id}")
+        return {"tracksFile": tracks_file, "videoIds": videoIds}
+
+    def download(self, params, emit):
+        """Download and tag the songs in tracksFile, or in every tracks file under data/ like download_song.py."""
+        tracks_file = params.get("tracksFile")
+        if tracks_file is not None and not isinstance(tracks_file, str):
+            raise InvalidParams("tracksFile must be a string")
+        if tracks_file:
+            files = [tracks_file]
+        elif os.path.isdir(DATA_FOLDER):
+            files = [os.path.join(DATA_FOLDER, f) for f in list_tracks_files(DATA_FOLDER)]
+        else:
+            files = []
+
+        results, skipped = [], []
+
+        def on_song(song, record):
+            if record is None:
+                skipped.append(song.videoId)
+                emit("skipped", song.videoId)
+                return
+            if record["state"] == TAGGED:
+                result = {"videoId": song.videoId, "path": record["path"], "error": None}
+                emit("tagged", song.videoId, path=record["path"])
+            else:
+                result = {"videoId": song.videoId, "path": None, "error": record["error"] or record["state"]}
+                emit("failed", song.videoId, error=result["error"])
+            results.append(result)
+
+        for path in files:
+            download_file(path, on_song=on_song)
+
+        failed = [r for r in results if r["error"]]
+        print(f"[INFO] Manifest: {get_manifest().summary()}", file=sys.stderr)
+        print_stats(file=sys.stderr)
+        print_rate_stats(file=sys.stderr)
+        return {"ok": len(results) - len(failed), "failed": len(failed), "skipped": len(skipped), "results": results}
+
+
+def warm_up():
+    """Build the YTMusic client and import yt-dlp while the first job is on its way."""
+    try:
+        get_ytmusic()
+        import yt_dlp  # noqa: F401
+    except Exception as e:
+        print(f"[WARN] Warm-up failed: {e}", file=sys.stderr)
+
+
+def main():
+    run(Worker, warm_up)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import threading
+
+
+class DownloadEngine:
+    """One configured YoutubeDL kept open across tracks.
+
+    Reusing it keeps the HTTP connections, cookie jar and extractor/player
+    state warm instead of rebuilding them for every song. A YoutubeDL is not
+    safe to share between threads, so use one engine per worker.
+    """
+
+    def __init__(self, opts):
+        # yt_dlp is only imported once a download actually starts
+        from yt_dlp import YoutubeDL
+        self.ydl = YoutubeDL(dict(opts))
+        self.ydl.__enter__()
+
+    def download(self, url, outtmpl):
+        """Download url to the given output template and return its info dict."""
+        self.ydl.params["outtmpl"]["default"] = outtmpl
+        return self.ydl.extract_info(url, download=True)
+
+    def close(self):
+        self.ydl.__exit__(None, None, None)
+
+
+class EnginePool:
+    """Hands each thread its own DownloadEngine, created on first use."""
+
+    def __init__(self, opts):
+        self.opts = opts
+        self._local = threading.local()
+        self._engines = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        engine = getattr(self._local, "engine", None)
+        if engine is None:
+            engine = DownloadEngine(self.opts)
+            self._local.engine = engine
+            with self._lock:
+                self._engines.append(engine)
+        return engine
+
+    def close_all(self):
+        with self._lock:
+            engines, self._engines = self._engines, []
+        for engine in engines:
+            try:
+                engine.close()
+            except Exception as e:
+                print(f"[WARN] Failed to close downloader: {e}")
+        self._local = threading.local()
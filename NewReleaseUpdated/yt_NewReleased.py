@@ -1,82 +1,88 @@
-import json
 import os
-from ytmusicapi import YTMusic
+import threading
+from metadata_cache import cached_get_song, print_stats
+from rate_limiter import RateLimited, print_stats as print_rate_stats
+from manifest import get_manifest
+from tracks_io import TracksWriter
+from track import Track
 import sys
-import io
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# Fix stdout for unicode
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+# Fix stdout for unicode (reconfigure is safe when imported by worker.py)
+sys.stdout.reconfigure(encoding='utf-8')
+sys.stderr.reconfigure(encoding='utf-8')
 
-def fetch_playlist_full_metadata(playlist_id):
-    ytmusic = YTMusic()
-    
+# How many playlist entries to process and how many get_song calls run at once
+TRACK_LIMIT = int(os.getenv("TRACK_LIMIT", "2"))
+METADATA_WORKERS = int(os.getenv("METADATA_WORKERS", "8"))
+
+_ytmusic = None
+_ytmusic_lock = threading.Lock()
+
+
+def get_ytmusic():
+    """One client shared by every metadata worker, built on first use.
+
+    Its calls go through the "ytmusic" rate limiter, so the workers share one budget.
+    """
+    global _ytmusic
+    with _ytmusic_lock:
+        if _ytmusic is None:
+            from ytmusicapi import YTMusic
+            _ytmusic = RateLimited(YTMusic(), "ytmusic")
+        return _ytmusic
+
+
+def fetch_song_data(videoId):
+    """Fetch full metadata for one playlist track as a Track, or None if it failed."""
     try:
-        playlist = ytmusic.get_playlist(playlist_id, limit=100)
+        # Fetch full metadata for each song
+        metadata = cached_get_song(get_ytmusic(), videoId)
+    except Exception as e:
+        print(f"[ERROR] Failed to fetch metadata for {videoId}: {e}", file=sys.stderr)
+        return None
+    get_manifest().mark_fetched(videoId)
+
+    # Keep only the projected fields; the raw streamingData/microformat blobs and
+    # the app deep links (Track.deep_links) are no longer stored per record
+    return Track.from_metadata(videoId, metadata)
+
+
+def fetch_playlist_full_metadata(playlist_id, limit=TRACK_LIMIT, workers=METADATA_WORKERS, on_track=None):
+    """Save full metadata for the first `limit` songs of a playlist; returns the tracks file written.
+
+    on_track(track) is called for each song as it is saved.
+    """
+    try:
+        playlist = get_ytmusic().get_playlist(playlist_id, limit=100)
     except Exception as e:
         print("[ERROR] Failed to fetch playlist:", e, file=sys.stderr)
-        return
-
-    all_songs_data = []
-
-    for idx, track in enumerate(playlist["tracks"], start=1):
-        
-        videoId = track.get("videoId")
-        if idx>2:
-            break
-        if not videoId:
-            continue
-
-        try:
-            # Fetch full metadata for each song
-            metadata = ytmusic.get_song(videoId)
-        except Exception as e:
-            print(f"[ERROR] Failed to fetch metadata for {videoId}: {e}", file=sys.stderr)
-            continue
-
-        # Extract essential fields
-        song_data = {
-            "videoId": videoId,
-
-            "title": metadata.get("videoDetails", {}).get("title"),
-            "artist": metadata.get("videoDetails", {}).get("author"),
-            "coverUrl": metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("thumbnail",{}).get("thumbnails",{}),
-            "description": metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("tags"),
-            "urlCanonical": metadata.get("videoDetails", {}).get("video_url"),
-            "viewCount": metadata.get("videoDetails", {}).get("viewCount"),
-            "publishDate": metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("publishDate"),
-            "category": metadata.get("videoDetails", {}).get("category"),
-            "tags": metadata.get("microformat", {}).get("microformatDataRenderer", {}).get("tags"),
-            "streamingData": metadata.get("streamingData"),
-            "playabilityStatus": metadata.get("playabilityStatus"),
-            "videoDetails": metadata.get("videoDetails"),
-            "microformat": metadata.get("microformat"),
-            "siteName": "YouTube Music",
-            "appName": "YouTube Music",
-            "androidPackage": "com.google.android.apps.youtube.music",
-            "iosAppStoreId": "1017492454",
-            "urls": {
-                "iosAppArguments": f"https://music.youtube.com/watch?v={videoId}",
-                "urlApplinksIos": f"vnd.youtube.music://music.youtube.com/watch?v={videoId}&feature=applinks",
-                "urlApplinksAndroid": f"vnd.youtube.music://music.youtube.com/watch?v={videoId}&feature=applinks",
-                "urlTwitterIos": f"vnd.youtube.music://music.youtube.com/watch?v={videoId}&feature=twitter-deep-link",
-                "urlTwitterAndroid": f"vnd.youtube.music://music.youtube.com/watch?v={videoId}&feature=twitter-deep-link",
-            }
-        }
-
-        all_songs_data.append(song_data)
-        print(f"[{idx}] {song_data['title']} - {song_data['urlCanonical']}", file=sys.stderr)
-
-    # Save all songs in JSON
-    os.makedirs("data", exist_ok=True)
+        return None
+
+    videoIds = [track.get("videoId") for track in playlist["tracks"][:limit]]
+
+    # Songs are appended to a JSON-lines file as they arrive instead of being
+    # collected and dumped at the end
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"data/playlist_full_{timestamp}.json"
+    filename = f"data/playlist_full_{timestamp}.jsonl"
+
+    # map() yields results in playlist order no matter which call finishes first
+    with TracksWriter(filename) as writer, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(lambda v: fetch_song_data(v) if v else None, videoIds)
 
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(all_songs_data, f, ensure_ascii=False, indent=2)
+        for idx, track in enumerate(results, start=1):
+            if not track:
+                continue
+            writer.write(track.to_dict())
+            print(f"[{idx}] {track.title} - {track.urlCanonical}", file=sys.stderr)
+            if on_track:
+                on_track(track)
 
     print(f"[INFO] Saved full playlist metadata to {filename}", file=sys.stderr)
+    print_stats(file=sys.stderr)
+    print_rate_stats(file=sys.stderr)
+    return filename
 
 if __name__ == "__main__":
     playlist_id = "RDATdX"
@@ -0,0 +1,108 @@
+import { spawn } from "child_process";
+import readline from "readline";
+
+// ✅ Default progress printer: one line per track event
+export function logProgress(event) {
+  const detail = event.error || event.path || [event.title, event.artist].filter(Boolean).join(" - ");
+  console.log(`[PROGRESS] ${event.stage} ${event.videoId}${detail ? `: ${detail}` : ""}`);
+}
+
+// ✅ Long-running Python worker (FetchTopUpdated/worker.py) spoken to over JSON-RPC on stdin/stdout.
+// One interpreter serves every job, so imports, the YTMusic client and the caches stay warm.
+export class PythonWorker {
+  constructor(script, { python = process.env.PYTHON || "python" } = {}) {
+    this.script = script;
+    this.python = python;
+    this.nextId = 1;
+    this.pending = new Map();
+    this.process = null;
+    this.exited = null;
+  }
+
+  start() {
+    if (this.process) return;
+    this.process = spawn(this.python, [this.script], { stdio: ["pipe", "pipe", "pipe"] });
+
+    // A write after the worker died surfaces here instead of crashing node
+    this.process.stdin.on("error", (err) => this.failPending(err));
+    readline.createInterface({ input: this.process.stdout }).on("line", (line) => this.onLine(line));
+    readline.createInterface({ input: this.process.stderr }).on("line", (line) => {
+      console.error(`[PYTHON STDERR] ${line}`);
+    });
+
+    this.exited = new Promise((resolve) => {
+      this.process.on("error", (err) => {
+        this.failPending(err);
+        resolve(null);
+      });
+      this.process.on("close", (code) => {
+        this.failPending(new Error(`Python worker exited with code ${code}`));
+        resolve(code);
+      });
+    });
+  }
+
+  onLine(line) {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch {
+      // Not a protocol line (e.g. a stray print); show it like the old runPython did
+      console.log(`[PYTHON STDOUT] ${line}`);
+      return;
+    }
+
+    if (message.method === "progress") {
+      const call = this.pending.get(message.params.id);
+      if (call) call.onEvent(message.params);
+      return;
+    }
+    if (message.method === "ready") {
+      console.log(`[INFO] Python worker ready (pid ${message.params.pid})`);
+      return;
+    }
+
+    const call = this.pending.get(message.id);
+    if (!call) {
+      if (message.error) console.error(`[ERROR] Python worker: ${message.error.message}`);
+      return;
+    }
+    this.pending.delete(message.id);
+    if (message.error) {
+      call.reject(new Error(`${call.method} failed: ${message.error.message}`));
+    } else {
+      call.resolve(message.result);
+    }
+  }
+
+  failPending(err) {
+    for (const call of this.pending.values()) call.reject(err);
+    this.pending.clear();
+  }
+
+  // ✅ Send one job; resolves with its result, onEvent gets each progress event
+  call(method, params = {}, onEvent = logProgress) {
+    this.start();
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      if (this.process.exitCode !== null) {
+        reject(new Error(`Python worker exited with code ${this.process.exitCode}`));
+        return;
+      }
+      this.pending.set(id, { method, resolve, reject, onEvent });
+      this.process.stdin.write(JSON.stringify({ jsonrpc: "2.0", id, method, params }) + "\n");
+    });
+  }
+
+  // ✅ Ask the worker to exit once its current job is done, and wait for it
+  async close() {
+    if (!this.process) return null;
+    if (this.process.exitCode === null) {
+      await this.call("shutdown").catch(() => {});
+      this.process.stdin.end();
+    }
+    return this.exited;
+  }
+}
+
+export default PythonWorker;
@@ -71,9 +71,12 @@ function getAllMp3Files(dir) {
 
   for (const file of list) {
     const fullPath = path.join(dir, file);
-    const stat = fs.statSync(fullPath);
+    // lstat so the by-name symlink view of a sharded library isn't uploaded twice
+    const stat = fs.lstatSync(fullPath);
 
-    if (stat.isDirectory()) {
+    if (stat.isSymbolicLink()) {
+      continue;
+    } else if (stat.isDirectory()) {
       results = results.concat(getAllMp3Files(fullPath));
     } else if (file.toLowerCase().endsWith(".mp3")) {
       results.push(fullPath);
@@ -0,0 +1,253 @@
+"""Offline micro-benchmarks for the download/tag path.
+
+Runs the hot components on generated fixtures (synthetic MP3 frames and
+tracks files of 10 to 100k entries) without touching the network, reports
+ops/sec and peak memory, and can save or compare against a baseline:
+
+    python benchmarks/bench_components.py --save
+    python benchmarks/bench_components.py --compare
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baseline.json")
+# Flag anything this much slower than the baseline
+REGRESSION_THRESHOLD = 0.20
+
+# One MPEG-1 Layer III frame: 128 kbit/s, 44.1 kHz, no padding -> 417 bytes
+MP3_FRAME = b"\xff\xfb\x90\x00" + b"\x00" * 413
+
+
+def load_module(name, folder):
+    """Import folder/<name>.py under a unique module name so the per-folder copies don't clash."""
+    path = os.path.join(ROOT, folder, f"{name}.py")
+    if os.path.join(ROOT, folder) not in sys.path:
+        sys.path.insert(0, os.path.join(ROOT, folder))
+    spec = importlib.util.spec_from_file_location(f"{folder}_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_mp3(path, frames=200):
+    with open(path, "wb") as f:
+        f.write(MP3_FRAME * frames)
+
+
+def make_track(i):
+    return {
+        "videoId": f"vid{i:08d}",
+        "title": f"Song Title {i} (Official Video) - Remastered | Live",
+        "artist": f"Artist {i % 500}",
+        "coverUrl": f"https://lh3.googleusercontent.com/cover{i}=w544-h544",
+        "urlCanonical": f"https://music.youtube.com/watch?v=vid{i:08d}",
+        "publishDate": "2025-05-01T00:00:00-07:00",
+        "tags": ["pop", "hindi", "bollywood", f"tag{i % 50}"],
+    }
+
+
+def write_tracks(path, count, as_array=False):
+    with open(path, "w", encoding="utf-8") as f:
+        if as_array:
+            json.dump([make_track(i) for i in range(count)], f, ensure_ascii=False, indent=2)
+        else:
+            for i in range(count):
+                f.write(json.dumps(make_track(i), ensure_ascii=False) + "\n")
+
+
+def measure(func, min_time=0.2, repeat=3):
+    """Best-of-repeat ops/sec, auto-scaling the loop count like timeit."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return loops / best
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def legacy_two_pass_tags(path, title, artist, tags, video_id, publishDate):
+    """The EasyID3-then-ID3 tagging the scripts used before the single-pass writer."""
+    from mutagen.easyid3 import EasyID3
+    from mutagen.id3 import ID3, ID3NoHeaderError, TKEY, COMM
+
+    try:
+        audio = EasyID3(path)
+    except ID3NoHeaderError:
+        ID3().save(path)
+        audio = EasyID3(path)
+    audio["title"] = title
+    audio["artist"] = artist
+    audio["composer"] = ", ".join(tags)
+    audio.save(v2_version=3)
+    id3 = ID3(path)
+    id3.add(TKEY(encoding=3, text=video_id))
+    id3.add(COMM(encoding=3, lang="eng", desc="ReleasedDate", text=publishDate.split("T")[0].replace("-", "")))
+    id3.save(v2_version=3)
+
+
+def build_benchmarks(workdir, sizes):
+    top = load_module("download_song", "FetchTopUpdated")
+    new = load_module("download_song", "NewReleaseUpdated")
+    tagging = load_module("tagging", "FetchTopUpdated")
+    tracks_io = load_module("tracks_io", "FetchTopUpdated")
+    track_mod = load_module("track", "FetchTopUpdated")
+
+    titles = [make_track(i)["title"] for i in range(100)]
+    benches = {}
+
+    benches["sanitize_filename x100"] = lambda: [top.sanitize_filename(t) for t in titles]
+    benches["clean_title x100"] = lambda: [new.clean_title(t) for t in titles]
+
+    # Tagging always starts from an untagged copy; "copy only" is the fixed cost to subtract
+    pristine = os.path.join(workdir, "pristine.mp3")
+    work = os.path.join(workdir, "work.mp3")
+    write_mp3(pristine)
+    meta = make_track(1)
+
+    benches["mp3 copy only"] = lambda: shutil.copyfile(pristine, work)
+
+    def tag_single():
+        shutil.copyfile(pristine, work)
+        tagging.write_mp3_tags(work, meta["title"], meta["artist"], tags=meta["tags"],
+                               video_id=meta["videoId"], publishDate=meta["publishDate"])
+    benches["tag single-pass"] = tag_single
+
+    def tag_legacy():
+        shutil.copyfile(pristine, work)
+        legacy_two_pass_tags(work, meta["title"], meta["artist"], meta["tags"],
+                             meta["videoId"], meta["publishDate"])
+    benches["tag legacy two-pass"] = tag_legacy
+
+    def retag_in_place():
+        tagging.write_mp3_tags(work, meta["title"], meta["artist"], tags=meta["tags"],
+                               video_id=meta["videoId"], publishDate=meta["publishDate"])
+    benches["retag existing (in place)"] = retag_in_place
+
+    # Reading back a tagged file with embedded cover art, as a library rebuild does
+    scanner = load_module("tag_scanner", "FetchTopUpdated")
+    tagged = os.path.join(workdir, "tagged.mp3")
+    write_mp3(tagged)
+    tagging.write_mp3_tags(tagged, meta["title"], meta["artist"], tags=meta["tags"], video_id=meta["videoId"],
+                           publishDate=meta["publishDate"], cover=(b"\xff\xd8\xff" + b"\x00" * 100 * 1024, "image/jpeg"))
+    benches["read tags mutagen"] = lambda: scanner.read_tags(tagged)
+    benches["read tags header scan"] = lambda: scanner.scan_id3(tagged)
+
+    rename_a = os.path.join(workdir, "vid00000001.mp3")
+    rename_b = os.path.join(workdir, "Song Title - Artist.mp3")
+    write_mp3(rename_a, frames=1)
+
+    def rename_round_trip():
+        os.rename(rename_a, rename_b)
+        os.rename(rename_b, rename_a)
+    benches["rename x2"] = rename_round_trip
+
+    for size in sizes:
+        jsonl = os.path.join(workdir, f"tracks_{size}.jsonl")
+        array = os.path.join(workdir, f"tracks_{size}.json")
+        write_tracks(jsonl, size)
+        write_tracks(array, size, as_array=True)
+
+        def load_json(path=array):
+            with open(path, "r", encoding="utf-8") as f:
+                json.load(f)
+        benches[f"json.load array n={size}"] = load_json
+        benches[f"iter_tracks array n={size}"] = lambda path=array: sum(1 for _ in tracks_io.iter_tracks(path))
+        benches[f"iter_tracks jsonl n={size}"] = lambda path=jsonl: sum(1 for _ in tracks_io.iter_tracks(path))
+        benches[f"Track.from_dict jsonl n={size}"] = lambda path=jsonl: sum(
+            1 for r in tracks_io.iter_tracks(path) if track_mod.Track.from_dict(r))
+
+    return benches
+
+
+def compare(results, baseline):
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        change = res["ops_per_sec"] / base["ops_per_sec"] - 1
+        mark = ""
+        if change < -REGRESSION_THRESHOLD:
+            mark = "  <-- REGRESSION"
+            regressions.append(name)
+        print(f"  {name:<36} {change:+7.1%} ops/sec  "
+              f"({base['peak_kib']:.0f} -> {res['peak_kib']:.0f} KiB peak){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,100000",
+                        help="comma-separated tracks file sizes (default: %(default)s)")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing loop")
+    parser.add_argument("--save", action="store_true", help=f"write results to {BASELINE_FILE}")
+    parser.add_argument("--compare", action="store_true", help="compare against the saved baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    cwd = os.getcwd()
+    # download_song creates Download_Songs/ in the working directory on import
+    os.chdir(workdir)
+    try:
+        benches = build_benchmarks(workdir, sizes)
+        results = {}
+        for name, func in benches.items():
+            if args.filter and args.filter not in name:
+                continue
+            ops = measure(func, min_time=args.min_time)
+            peak = peak_memory(func) / 1024
+            results[name] = {"ops_per_sec": ops, "peak_kib": peak}
+            print(f"{name:<38} {ops:>14,.1f} ops/sec {peak:>12,.1f} KiB peak")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"[ERROR] No baseline at {args.baseline}; run with --save first")
+            sys.exit(2)
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline}:")
+        if compare(results, baseline):
+            sys.exit(1)
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[INFO] Saved baseline to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
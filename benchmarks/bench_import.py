@@ -0,0 +1,138 @@
+"""Import-time benchmark for the script entry points, using python -X importtime.
+
+Each module is imported in a fresh interpreter (from a scratch working
+directory, since some scripts create folders on import). Reports the
+cumulative import time of the module and its heaviest dependencies, and can
+save or compare against a baseline:
+
+    python benchmarks/bench_import.py --save
+    python benchmarks/bench_import.py --compare
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "import_baseline.json")
+# Flag anything this much slower than the baseline
+REGRESSION_THRESHOLD = 0.25
+# A module over the threshold is measured this many more times before it counts,
+# since a single busy moment on a shared runner can swing a 30 ms import by that much
+CONFIRM_REPEAT = 3
+
+# (folder, module) for every script the workflows start
+ENTRY_POINTS = [
+    ("FetchTopUpdated", "pipeline"),
+    ("FetchTopUpdated", "yt_trending"),
+    ("FetchTopUpdated", "download_song"),
+    ("FetchTopUpdated", "batch_fetch"),
+    ("FetchTopUpdated", "uploader"),
+    ("NewReleaseUpdated", "yt_NewReleased"),
+    ("NewReleaseUpdated", "download_song"),
+    ("ForSystemUseUploadManually", "yt_trending"),
+    ("ForSystemUseUploadManually", "download_song"),
+]
+HEAVY_PACKAGES = ("yt_dlp", "ytmusicapi", "mutagen", "requests", "PIL")
+
+
+def import_profile(folder, module, workdir):
+    """Run `import module` under -X importtime; return {package: cumulative microseconds}."""
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, folder), PYTHONDONTWRITEBYTECODE="")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=workdir, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {proc.stderr.strip().splitlines()[-1]}")
+    profile = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        profile[name] = max(profile.get(name, 0), int(cumulative))
+    return profile
+
+
+def measure(folder, module, workdir, repeat):
+    """Median of repeat runs after one warm-up run (page cache and .pyc files).
+
+    The median rather than the best run, so a baseline is not saved from one
+    lucky run that later runs can't get near.
+    """
+    import_profile(folder, module, workdir)
+    profiles = sorted((import_profile(folder, module, workdir) for _ in range(max(1, repeat))),
+                      key=lambda p: p.get(module, 0))
+    return profiles[len(profiles) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only modules whose folder/name contains this")
+    parser.add_argument("--save", action="store_true", help=f"write results to {BASELINE_FILE}")
+    parser.add_argument("--compare", action="store_true", help="compare against the saved baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"[ERROR] No baseline at {args.baseline}; run with --save first")
+            sys.exit(2)
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    def change(name, res):
+        base = baseline.get(name) if baseline else None
+        if not base or not base["import_ms"]:
+            return 0
+        return res["import_ms"] / base["import_ms"] - 1
+
+    workdir = tempfile.mkdtemp(prefix="bench_import_")
+    results = {}
+    try:
+        for folder, module in ENTRY_POINTS:
+            name = f"{folder}/{module}"
+            if args.filter and args.filter not in name:
+                continue
+            profile = measure(folder, module, workdir, args.repeat)
+            for _ in range(CONFIRM_REPEAT):
+                res = {"import_ms": profile.get(module, 0) / 1000}
+                if change(name, res) <= REGRESSION_THRESHOLD:
+                    break
+                profile = measure(folder, module, workdir, args.repeat)
+            total_ms = profile.get(module, 0) / 1000
+            heavy = {p: profile[p] / 1000 for p in HEAVY_PACKAGES if p in profile}
+            results[name] = {"import_ms": total_ms, "heavy_ms": heavy}
+            loaded = ", ".join(f"{p} {ms:.0f}ms" for p, ms in heavy.items()) or "none"
+            print(f"{name:<42} {total_ms:>8.1f} ms   heavy: {loaded}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.compare:
+        print(f"\nCompared with {args.baseline}:")
+        regressions = []
+        for name, res in results.items():
+            base = baseline.get(name)
+            if not base:
+                continue
+            change_pct = change(name, res)
+            mark = ""
+            if change_pct > REGRESSION_THRESHOLD:
+                mark = "  <-- REGRESSION"
+                regressions.append(name)
+            print(f"  {name:<40} {base['import_ms']:>8.1f} -> {res['import_ms']:>8.1f} ms ({change_pct:+.0%}){mark}")
+        if regressions:
+            sys.exit(1)
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[INFO] Saved baseline to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
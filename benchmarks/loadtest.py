@@ -0,0 +1,331 @@
+"""End-to-end load test for the FetchTopUpdated flow with local stand-ins.
+
+YTMusic and YoutubeDL are replaced by fakes before the scripts are imported.
+The fake YoutubeDL pulls pre-generated audio from a local HTTP server, so the
+whole run exercises real sockets, files, the manifest, the metadata cache and
+tagging without touching YouTube:
+
+    python benchmarks/loadtest.py --tracks 1000 --mode pipeline
+    python benchmarks/loadtest.py --tracks 1000 --mode scan --fail-rate 0.02
+
+Per-track latency is measured from the start of the track's metadata fetch
+until its tagged file is published.
+"""
+import argparse
+import contextlib
+import http.client
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FOLDER = os.path.join(ROOT, "FetchTopUpdated")
+
+# One MPEG-1 Layer III frame: 128 kbit/s, 44.1 kHz, no padding -> 417 bytes
+MP3_FRAME = b"\xff\xfb\x90\x00" + b"\x00" * 413
+
+
+class Settings:
+    """Knobs shared by the fakes and the audio server."""
+
+    metadata_latency = 0.05
+    download_latency = 0.2
+    fail_rate = 0.0
+    payload = b""
+    cover = b"\xff\xd8\xff\xe0" + b"\x00" * 40 * 1024
+    # Tracks share covers in groups, as songs from one album do
+    albums = 10
+    base_url = ""
+
+
+def jitter(seconds):
+    """Sleep for seconds +/- 50%."""
+    if seconds > 0:
+        time.sleep(seconds * random.uniform(0.5, 1.5))
+
+
+class AudioHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.startswith("/cover/"):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(Settings.cover)))
+            self.end_headers()
+            self.wfile.write(Settings.cover)
+            return
+        jitter(Settings.download_latency)
+        if random.random() < Settings.fail_rate:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(Settings.payload)))
+        self.end_headers()
+        self.wfile.write(Settings.payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AudioHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class FakeYTMusic:
+    """Answers get_playlist/get_song with synthetic metadata."""
+
+    tracks = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_playlist(self, playlist_id, limit=100):
+        return {"tracks": [{"videoId": f"lt{i:08d}"} for i in range(self.tracks)]}
+
+    def get_song(self, videoId, signatureTimestamp=None):
+        jitter(Settings.metadata_latency)
+        if random.random() < Settings.fail_rate:
+            raise Exception(f"Server returned HTTP 500 for {videoId}")
+        return {
+            "videoDetails": {
+                "videoId": videoId,
+                "title": f"Load Test Song {videoId}",
+                "author": f"Artist {int(videoId[2:]) % 100}",
+                "video_url": f"https://music.youtube.com/watch?v={videoId}",
+                "viewCount": "1000",
+            },
+            "microformat": {"microformatDataRenderer": {
+                "publishDate": "2025-05-01T00:00:00-07:00",
+                "tags": ["pop", "load-test"],
+                "thumbnail": {"thumbnails": [
+                    {"url": f"{Settings.base_url}/cover/{int(videoId[2:]) % Settings.albums}.jpg"}]},
+            }},
+        }
+
+
+class FakeYoutubeDL:
+    """Downloads from the local audio server into the configured output template.
+
+    With an FFmpegExtractAudio postprocessor the file is written straight to
+    the target extension, as if ffmpeg had already run.
+    """
+
+    server_address = None
+
+    def __init__(self, params=None):
+        self.params = dict(params or {})
+        outtmpl = self.params.get("outtmpl", "%(id)s.%(ext)s")
+        self.params["outtmpl"] = outtmpl if isinstance(outtmpl, dict) else {"default": outtmpl}
+        self._conn = http.client.HTTPConnection(*self.server_address, timeout=30)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._conn.close()
+
+    def extract_info(self, url, download=True):
+        videoId = url.split("v=")[-1].split("&")[0]
+        ext, acodec = "webm", "opus"
+        for pp in self.params.get("postprocessors", []):
+            if pp.get("key") == "FFmpegExtractAudio":
+                ext = acodec = pp.get("preferredcodec", ext)
+        info = {"id": videoId, "title": videoId, "ext": ext, "acodec": acodec}
+
+        self._progress({"status": "downloading", "info_dict": info, "downloaded_bytes": 0})
+        self._conn.request("GET", f"/audio/{videoId}")
+        resp = self._conn.getresponse()
+        body = resp.read()
+        if resp.status != 200:
+            self._progress({"status": "error", "info_dict": info})
+            raise Exception(f"ERROR: unable to download video data: HTTP Error {resp.status}")
+
+        path = self.prepare_filename(info)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(body)
+        self._progress({"status": "finished", "info_dict": info, "filename": path,
+                        "total_bytes": len(body), "downloaded_bytes": len(body)})
+        info["requested_downloads"] = [{"filepath": path}]
+        return info
+
+    def _progress(self, d):
+        for hook in self.params.get("progress_hooks", []):
+            hook(d)
+
+    def prepare_filename(self, info):
+        return self.params["outtmpl"]["default"].replace("%(id)s", info["id"]).replace("%(ext)s", info["ext"])
+
+
+def install_fakes():
+    """Swap the library classes before the scripts import them."""
+    import ytmusicapi
+    import yt_dlp
+    ytmusicapi.YTMusic = FakeYTMusic
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+
+
+class Timeline:
+    """Per-track start/finish times, keyed by videoId."""
+
+    def __init__(self):
+        self.started = {}
+        self.finished = {}
+        self._lock = threading.Lock()
+
+    def start(self, videoId):
+        with self._lock:
+            self.started.setdefault(videoId, time.perf_counter())
+
+    def finish(self, videoId):
+        with self._lock:
+            self.finished[videoId] = time.perf_counter()
+
+    def latencies(self):
+        return sorted(self.finished[v] - self.started[v] for v in self.finished if v in self.started)
+
+
+def timed_fetch(fetch, timeline):
+    def wrapper(videoId):
+        timeline.start(videoId)
+        return fetch(videoId)
+    return wrapper
+
+
+def timed_finish(finish, timeline):
+    def wrapper(track, path):
+        result = finish(track, path)
+        timeline.finish(track.videoId)
+        return result
+    return wrapper
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    idx = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[idx]
+
+
+def copy_transcode(src, dst, audio_format, source_codec=None):
+    """The payload is already MP3; skip the encoder so only the harness is measured."""
+    shutil.copyfile(src, dst)
+
+
+def copy_encode(src, out, audio_format, source_codec=None):
+    """Streaming counterpart of copy_transcode."""
+    with open(src, "rb") as f:
+        shutil.copyfileobj(f, out)
+
+
+def run_scan(timeline, args):
+    """Fetch the whole playlist, then download it: yt_trending + download_song."""
+    import yt_trending
+    import download_song
+
+    yt_trending.fetch_song_data = timed_fetch(yt_trending.fetch_song_data, timeline)
+    download_song.finish_tagged = timed_finish(download_song.finish_tagged, timeline)
+    if not args.ffmpeg:
+        download_song.transcode = copy_transcode
+        download_song.encode_to = copy_encode
+    yt_trending.fetch_playlist_full_metadata("loadtest", limit=args.tracks, workers=args.fetch_workers)
+    download_song.scan_and_download(workers=args.download_workers, transcode_workers=args.transcode_workers)
+
+
+def run_pipeline(timeline, args):
+    """Streaming fetch -> download -> transcode -> tag via pipeline.Pipeline."""
+    import pipeline
+    import download_song
+
+    pipeline.fetch_song_data = timed_fetch(pipeline.fetch_song_data, timeline)
+    pipeline.finish_tagged = timed_finish(pipeline.finish_tagged, timeline)
+    if not args.ffmpeg:
+        pipeline.transcode = copy_transcode
+        download_song.encode_to = copy_encode
+    pipeline.Pipeline(fetch_workers=args.fetch_workers, download_workers=args.download_workers,
+                      transcode_workers=args.transcode_workers).run(
+        "loadtest", limit=args.tracks)
+
+
+MODES = {"scan": run_scan, "pipeline": run_pipeline}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=MODES, default="pipeline")
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--download-workers", type=int, default=4)
+    parser.add_argument("--transcode-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--metadata-latency", type=float, default=0.05, help="seconds per get_song")
+    parser.add_argument("--download-latency", type=float, default=0.2, help="seconds per audio request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="chance each fake call fails")
+    parser.add_argument("--payload-kb", type=int, default=256, help="size of the served audio file")
+    parser.add_argument("--ffmpeg", action="store_true", help="run the real transcode stage")
+    parser.add_argument("--ytmusic-rate", default="1000", help="YTMUSIC_RATE for the run (default: unlimited)")
+    parser.add_argument("--download-rate", default="1000", help="DOWNLOAD_RATE for the run (default: unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="show the scripts' own output")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    Settings.metadata_latency = args.metadata_latency
+    Settings.download_latency = args.download_latency
+    Settings.fail_rate = args.fail_rate
+    Settings.payload = MP3_FRAME * max(1, args.payload_kb * 1024 // len(MP3_FRAME))
+    FakeYTMusic.tracks = args.tracks
+
+    server = start_server()
+    FakeYoutubeDL.server_address = server.server_address
+    Settings.base_url = "http://%s:%d" % server.server_address
+    install_fakes()
+    os.environ["YTMUSIC_RATE"] = os.environ["YTMUSIC_BURST"] = args.ytmusic_rate
+    os.environ["DOWNLOAD_RATE"] = os.environ["DOWNLOAD_BURST"] = args.download_rate
+    sys.path.insert(0, FOLDER)
+
+    # The scripts keep data/, Download_Songs/ and .cache/ relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    timeline = Timeline()
+    sink = None if args.verbose else open(os.devnull, "w", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            if sink:
+                stack.enter_context(sink)
+                stack.enter_context(contextlib.redirect_stdout(sink))
+                stack.enter_context(contextlib.redirect_stderr(sink))
+            MODES[args.mode](timeline, args)
+    finally:
+        elapsed = time.perf_counter() - start
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        server.shutdown()
+
+    latencies = timeline.latencies()
+    done = len(latencies)
+    print(f"[INFO] Mode {args.mode}: {done}/{args.tracks} tracks tagged in {elapsed:.1f}s "
+          f"({args.fetch_workers} fetch / {args.download_workers} download workers)")
+    print(f"[INFO] Throughput: {done / elapsed * 60:.1f} tracks/min")
+    print(f"[INFO] Per-track latency: p50 {percentile(latencies, 50):.2f}s, "
+          f"p95 {percentile(latencies, 95):.2f}s, max {percentile(latencies, 100):.2f}s")
+    if done < args.tracks:
+        print(f"[WARN] {args.tracks - done} tracks did not finish (fail rate {args.fail_rate:.0%})")
+
+
+if __name__ == "__main__":
+    main()
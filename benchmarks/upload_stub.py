@@ -0,0 +1,109 @@
+"""Local stand-in for the admin upload API, for exercising FetchTopUpdated/uploader.py.
+
+Implements POST /api/auth/admin/login and POST /api/admin/upload-automated-python-yt.
+Tokens expire after --token-uploads uploads so the 401 re-login path gets used:
+
+    python benchmarks/upload_stub.py --port 8765
+    UPLOAD_API_BASE=http://127.0.0.1:8765/api python FetchTopUpdated/uploader.py
+"""
+import argparse
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    latency = 0.05
+    fail_rate = 0.0
+    token_uploads = 20
+    tokens = {}
+    uploads = []
+    logins = 0
+    lock = threading.Lock()
+
+
+class UploadHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/api/auth/admin/login":
+            token = secrets.token_hex(8)
+            with StubState.lock:
+                StubState.tokens[token] = StubState.token_uploads
+                StubState.logins += 1
+            return self._reply(200, {"token": token})
+
+        if self.path != "/api/admin/upload-automated-python-yt":
+            return self._reply(404, {"error": "not found"})
+
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        with StubState.lock:
+            left = StubState.tokens.get(token, 0)
+            if left <= 0:
+                StubState.tokens.pop(token, None)
+                expired = True
+            else:
+                StubState.tokens[token] = left - 1
+                expired = False
+        if expired:
+            return self._reply(401, {"error": "token expired"})
+
+        time.sleep(StubState.latency * random.uniform(0.5, 1.5))
+        if random.random() < StubState.fail_rate:
+            return self._reply(500, {"error": "random failure"})
+        match = re.search(rb'name="audio"; filename="([^"]*)"', body)
+        if not match:
+            return self._reply(400, {"error": "missing audio field"})
+        with StubState.lock:
+            StubState.uploads.append((match.group(1).decode(), len(body)))
+        return self._reply(201, {"message": "uploaded", "file": match.group(1).decode()})
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(port=0, latency=0.05, fail_rate=0.0, token_uploads=20):
+    """Start the stub on a background thread and return the server."""
+    StubState.latency = latency
+    StubState.fail_rate = fail_rate
+    StubState.token_uploads = token_uploads
+    server = ThreadingHTTPServer(("127.0.0.1", port), UploadHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per upload")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--token-uploads", type=int, default=20, help="uploads allowed per token")
+    args = parser.parse_args()
+
+    server = start_stub(args.port, args.latency, args.fail_rate, args.token_uploads)
+    print(f"[INFO] Upload stub listening on http://127.0.0.1:{server.server_address[1]}/api")
+    try:
+        while True:
+            time.sleep(5)
+            with StubState.lock:
+                print(f"[INFO] {len(StubState.uploads)} uploads, {StubState.logins} logins")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()